@@ -0,0 +1,104 @@
+import json
+import os
+
+import numpy as np
+
+ARCHETYPES_FILE = "archetypes.json"
+DEFAULT_COLOR = (200, 200, 200)
+
+# Типы врагов, уровни и баланс описаны в archetypes.json. При загрузке файл
+# компилируется в плотные таблицы: характеристики и цвета - по type_id
+# (номер типа в порядке файла), интервал и веса появления - по уровню.
+# В горячем цикле остаётся только индексация, новый тип или уровень не
+# требует новых веток в коде. Последний уровень в файле действует и для
+# всех уровней выше него.
+#
+# Файл можно править во время игры: reload_if_changed() подхватывает новую
+# версию. Враги, которые уже на арене, сохраняют свои характеристики; их
+# type_id World.set_archetypes() переводит по имени типа, а враги удалённых
+# типов исчезают с арены.
+
+
+class Archetypes:
+    def __init__(self, data, path=None, mtime=None):
+        self.path = path
+        self.mtime = mtime
+        self.balance = dict(data["balance"])
+        enemies = data["enemies"]
+        if not enemies:
+            raise ValueError("В файле нет ни одного типа врага")
+        self.names = list(enemies)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.size = np.array([enemies[name]["size"] for name in self.names], dtype=np.float64)
+        self.speed = np.array([enemies[name]["speed"] for name in self.names], dtype=np.float64)
+        self.hp = np.array([enemies[name]["hp"] for name in self.names], dtype=np.float64)
+        self.score = np.array([enemies[name]["score"] for name in self.names], dtype=np.int32)
+        self.colors = [tuple(enemies[name].get("color", DEFAULT_COLOR)) for name in self.names]
+        for field in ("size", "speed", "hp"):
+            bad = [name for name, value in zip(self.names, getattr(self, field)) if not value > 0]
+            if bad:
+                raise ValueError(f"{field} должен быть больше нуля: {bad}")
+
+        levels = data["levels"]
+        if not levels:
+            raise ValueError("В файле нет ни одного уровня")
+        self.level_interval = []
+        self.level_types = []
+        self.level_cum_weights = []
+        for number, level in enumerate(levels):
+            spawn = level["spawn"]
+            unknown = [name for name in spawn if name not in self.ids]
+            if unknown or not spawn:
+                raise ValueError(f"Уровень {number}: неизвестные типы врагов {unknown}")
+            weights = list(spawn.values())
+            if not float(level["interval"]) > 0:
+                raise ValueError(f"Уровень {number}: interval должен быть больше нуля")
+            if not all(weight > 0 for weight in weights):
+                raise ValueError(f"Уровень {number}: веса появления должны быть больше нуля")
+            self.level_interval.append(float(level["interval"]))
+            self.level_types.append([self.ids[name] for name in spawn])
+            # Равные веса - обычный rng.choice, как было до таблиц
+            # (та же последовательность случайных чисел для тех же seed).
+            if len(set(weights)) == 1:
+                self.level_cum_weights.append(None)
+            else:
+                self.level_cum_weights.append(np.cumsum(weights).tolist())
+        self.last_level = len(levels) - 1
+
+    def spawn_interval(self, level):
+        return self.level_interval[min(level, self.last_level)]
+
+    def spawn_type(self, rng, level):
+        level = min(level, self.last_level)
+        cum_weights = self.level_cum_weights[level]
+        if cum_weights is None:
+            return rng.choice(self.level_types[level])
+        return rng.choices(self.level_types[level], cum_weights=cum_weights)[0]
+
+
+def load_archetypes(path=ARCHETYPES_FILE):
+    mtime = os.path.getmtime(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return Archetypes(data, path, mtime)
+
+
+def reload_if_changed(archetypes):
+    # Новые таблицы, если файл изменился, иначе None. Ошибка в файле
+    # печатается, а игра продолжает работать со старыми таблицами.
+    try:
+        mtime = os.path.getmtime(archetypes.path)
+    except OSError:
+        return None
+    if mtime == archetypes.mtime:
+        return None
+    # Битый файл не перечитывается каждый раз, только после следующей правки.
+    archetypes.mtime = mtime
+    try:
+        return load_archetypes(archetypes.path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Не удалось перезагрузить {archetypes.path}: {e}")
+        return None
+
+
+ARCHETYPES = load_archetypes()
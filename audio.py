@@ -0,0 +1,218 @@
+import hashlib
+import json
+import math
+import mmap
+import struct
+import threading
+import time
+
+import pygame
+
+from savegame import write_atomic
+from scheduler import Scheduler
+
+SOUND_FILES = {
+    "shoot": "shoot_sound.mp3",
+    "death": "death_sound.mp3",
+}
+MUSIC_FILE = "music.wav"
+BUNDLE_FILE = "audio_cache.bin"
+BUNDLE_MAGIC = b"ARENAPCM"
+
+# Звуки декодируются из mp3 один раз и складываются в один файл с сырым PCM
+# в формате микшера (22050 Гц, 16 бит, стерео). Формат файла: BUNDLE_MAGIC,
+# длина индекса (uint32), индекс в JSON {"key": ..., "sounds": {имя: [смещение,
+# длина]}}, затем данные. key - хеш исходных файлов и настроек микшера: если
+# что-то из них изменилось, файл собирается заново. При обычном запуске файл
+# отображается в память (mmap) и звуки создаются прямо из его страниц.
+# Музыка в файл не входит: mixer.music проигрывает её потоком с диска.
+
+
+def bundle_key():
+    digest = hashlib.sha1(repr(pygame.mixer.get_init()).encode())
+    for name, path in sorted(SOUND_FILES.items()):
+        digest.update(name.encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def read_bundle(key, path=BUNDLE_FILE):
+    # None - файла нет, он повреждён или собран из других исходников.
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    with data:
+        try:
+            if data[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+                return None
+            start = len(BUNDLE_MAGIC) + 4
+            (index_length,) = struct.unpack_from("<I", data, len(BUNDLE_MAGIC))
+            index = json.loads(data[start:start + index_length].decode("utf-8"))
+            if index.get("key") != key or set(index["sounds"]) != set(SOUND_FILES):
+                return None
+            view = memoryview(data)
+            try:
+                # Sound(buffer=...) копирует PCM в свой буфер, срезы memoryview - нет.
+                return {name: pygame.mixer.Sound(buffer=view[offset:offset + length])
+                        for name, (offset, length) in index["sounds"].items()}
+            finally:
+                view.release()
+        except (ValueError, KeyError, TypeError, struct.error):
+            return None
+
+
+def build_bundle(key, path=BUNDLE_FILE):
+    sounds = {name: pygame.mixer.Sound(source) for name, source in SOUND_FILES.items()}
+    raw = {name: sound.get_raw() for name, sound in sounds.items()}
+    offsets = {}
+    index_length = 0
+    # Смещения зависят от длины индекса, а длина индекса - от смещений,
+    # поэтому индекс пересчитывается, пока его длина не перестанет меняться.
+    while True:
+        offset = len(BUNDLE_MAGIC) + 4 + index_length
+        for name, pcm in raw.items():
+            offsets[name] = [offset, len(pcm)]
+            offset += len(pcm)
+        index = json.dumps({"key": key, "sounds": offsets}).encode("utf-8")
+        if len(index) == index_length:
+            break
+        index_length = len(index)
+    try:
+        write_atomic(path, b"".join([BUNDLE_MAGIC, struct.pack("<I", len(index)), index, *raw.values()]))
+    except OSError as e:
+        print(f"Не удалось сохранить кэш звуков: {e}")
+    return sounds
+
+
+def load_sounds():
+    key = bundle_key()
+    sounds = read_bundle(key)
+    if sounds is None:
+        sounds = build_bundle(key)
+    return sounds
+
+
+# Звук загружается уже после первого кадра: start() вызывается из главного
+# цикла, декодирование mp3 и запуск музыки идут в отдельном потоке. Пока
+# звуки не готовы, запросы на проигрывание отбрасываются, а громкость
+# запоминается и применяется при следующем запуске звука.
+#
+# Эффекты проигрываются только через менеджер голосов: play() лишь копит
+# запросы, а update() раз в кадр запускает каждый звук не больше одного
+# раза. Несколько одинаковых запросов за кадр сливаются в один запуск
+# погромче. У каждого звука свои каналы (музыка идёт отдельным потоком
+# mixer.music и каналов не занимает), плюс общий запас, который в кадре
+# достаётся звукам по приоритету. Если свободных каналов нет, звук
+# вытесняет самый старый голос в своей группе. Минимальный интервал между
+# запусками отсчитывается по времени, переданному в update(dt): звук,
+# запущенный с интервалом, ставит в очередь событие о конце паузы.
+
+# имя: (своих каналов, приоритет, минимальный интервал в секундах)
+VOICE_RULES = {
+    "death": (3, 2, 0.0),
+    "shoot": (1, 1, 0.2),
+}
+SPARE_CHANNELS = 2
+
+
+class Audio:
+    def __init__(self, music_volume=0.6, shoot_volume=0.2, death_volume=0.2):
+        self.volumes = {"music": music_volume, "shoot": shoot_volume, "death": death_volume}
+        self.sounds = {}
+        self.ready = threading.Event()
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._spare = []
+        self._started = {}
+        self._cooldowns = Scheduler()
+        self._cooling = set()
+        self._pending = {}
+        # Статистика последнего update() для профилировщика.
+        self.played = 0
+        self.merged = 0
+
+    def start(self):
+        if pygame.mixer.get_init():
+            total = sum(rule[0] for rule in VOICE_RULES.values()) + SPARE_CHANNELS
+            pygame.mixer.set_num_channels(total)
+            # Все каналы зарезервированы: Sound.play() в обход менеджера их не займёт.
+            pygame.mixer.set_reserved(total)
+            index = 0
+            for name, (voices, priority, interval) in VOICE_RULES.items():
+                self._groups[name] = [pygame.mixer.Channel(i) for i in range(index, index + voices)]
+                index += voices
+            self._spare = [pygame.mixer.Channel(i) for i in range(index, total)]
+        threading.Thread(target=self._load, name="audio-loader", daemon=True).start()
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            sounds = load_sounds()
+        except (pygame.error, OSError) as e:
+            print(f"Не удалось загрузить звук: {e}")
+            sounds = {}
+        self.sounds = sounds
+        try:
+            pygame.mixer.music.load(MUSIC_FILE)
+            with self._lock:
+                pygame.mixer.music.set_volume(self.volumes["music"])
+            pygame.mixer.music.play(-1)
+        except pygame.error as e:
+            print(f"Не удалось загрузить музыку: {e}")
+        self.load_seconds = time.perf_counter() - started
+        self.ready.set()
+
+    def play(self, name, count=1):
+        self._pending[name] = self._pending.get(name, 0) + count
+
+    def update(self, dt):
+        self.played = 0
+        self.merged = 0
+        cooldowns = self._cooldowns
+        cooldowns.advance(dt)
+        for name, args in cooldowns.pop_due():
+            self._cooling.discard(name)
+        if not self._pending:
+            return
+        pending = sorted(self._pending.items(), key=lambda item: -VOICE_RULES[item[0]][1])
+        self._pending.clear()
+        now = cooldowns.now
+        for name, count in pending:
+            sound = self.sounds.get(name)
+            if sound is None or name in self._cooling:
+                continue
+            channel = self._channel(name)
+            # Громкость растёт с логарифмом числа слитых запросов.
+            channel.set_volume(min(1.0, self.volumes[name] * (1 + 0.5 * math.log2(count))))
+            channel.play(sound)
+            self._started[channel] = now
+            interval = VOICE_RULES[name][2]
+            if interval > 0:
+                self._cooling.add(name)
+                cooldowns.after(interval, name)
+            self.played += 1
+            self.merged += count - 1
+
+    def _channel(self, name):
+        group = self._groups[name]
+        for channel in group:
+            if not channel.get_busy():
+                return channel
+        for channel in self._spare:
+            if not channel.get_busy():
+                return channel
+        return min(group, key=lambda channel: self._started.get(channel, 0.0))
+
+    def busy_voices(self):
+        channels = [channel for group in self._groups.values() for channel in group] + self._spare
+        return sum(channel.get_busy() for channel in channels), len(channels)
+
+    def set_volume(self, name, volume):
+        with self._lock:
+            self.volumes[name] = volume
+            if name == "music" and pygame.mixer.get_init():
+                pygame.mixer.music.set_volume(volume)
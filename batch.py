@@ -0,0 +1,156 @@
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from simulation import World, POLICIES, DEFAULT_BALANCE, SIM_DT, run_headless
+
+# Пакетный прогон сессий без окна для настройки баланса: каждая точка сетки
+# параметров (см. DEFAULT_BALANCE) прогоняется на многих seed всеми ядрами.
+# Процесс пула создаёт World один раз и дальше только сбрасывает его,
+# назад приходит короткий кортеж на сессию. Итог - распределения времени
+# жизни, убийств и монет и причины смерти по уровням.
+#
+#   python batch.py --sessions 1000 --policy kite --max-seconds 600 \
+#       --grid damage_step=0.15,0.2,0.25 --grid spawn_scale=0.8,1.0
+
+RESULT_FILE = "batch_results.json"
+
+_world = None
+_policy = None
+_max_ticks = 0
+
+
+def _init_worker(policy_name, max_ticks):
+    global _world, _policy, _max_ticks
+    _world = World()
+    _policy = POLICIES[policy_name]
+    _max_ticks = max_ticks
+
+
+def _run_session(task):
+    point, balance, seed = task
+    world = _world
+    world.balance = dict(DEFAULT_BALANCE, **balance)
+    world.reset(seed=seed)
+    run_headless(world, _policy, SIM_DT, _max_ticks)
+    cause = world.killed_by if not world.alive else "выжил"
+    return point, world.elapsed_seconds, world.kills, world.money, world.upgrade_level, cause
+
+
+def parse_number(text):
+    # Целое, если записано целым (upgrade_interval=20), иначе дробное (20.5).
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_grid(specs):
+    names = []
+    values = []
+    for spec in specs:
+        name, _, options = spec.partition("=")
+        if name not in DEFAULT_BALANCE:
+            raise ValueError(f"Неизвестный параметр: {name}")
+        names.append(name)
+        try:
+            values.append([parse_number(option) for option in options.split(",")])
+        except ValueError:
+            raise ValueError(f"Параметр {name}: значения должны быть числами, а не {options!r}")
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def distribution(values):
+    values = np.asarray(values, dtype=np.float64)
+    p10, p50, p90 = np.percentile(values, (10, 50, 90))
+    return {"mean": round(float(values.mean()), 2), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+
+def summarize(balance, rows):
+    # rows - (время, убийства, монеты, уровень, причина) по сессиям одной точки.
+    seconds, kills, money, levels, causes = zip(*rows)
+    by_level = {}
+    for level, cause in zip(levels, causes):
+        counts = by_level.setdefault(str(level), {})
+        counts[cause] = counts.get(cause, 0) + 1
+    return {
+        "balance": balance,
+        "sessions": len(rows),
+        "seconds": distribution(seconds),
+        "kills": distribution(kills),
+        "money": distribution(money),
+        "deaths_by_level": dict(sorted(by_level.items(), key=lambda item: int(item[0]))),
+    }
+
+
+def run_batch(grid, sessions, policy="nearest", max_seconds=600, workers=None, seed=0):
+    tasks = [(point, balance, seed + i) for point, balance in enumerate(grid) for i in range(sessions)]
+    rows = [[] for _ in grid]
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, len(tasks) // (workers * 8))
+    with multiprocessing.Pool(workers, _init_worker, (policy, int(max_seconds / SIM_DT))) as pool:
+        for done, (point, *row) in enumerate(pool.imap_unordered(_run_session, tasks, chunk), 1):
+            rows[point].append(row)
+            if done % 100 == 0 or done == len(tasks):
+                print(f"\rСессий: {done}/{len(tasks)}", end="", flush=True)
+    print()
+    return [summarize(balance, point_rows) for balance, point_rows in zip(grid, rows)]
+
+
+def main(argv):
+    sessions = 200
+    policy = "nearest"
+    max_seconds = 600
+    workers = None
+    specs = []
+    out = RESULT_FILE
+    args = iter(argv)
+    for arg in args:
+        if arg == "--sessions":
+            sessions = int(next(args))
+        elif arg == "--policy":
+            policy = next(args)
+        elif arg == "--max-seconds":
+            max_seconds = float(next(args))
+        elif arg == "--workers":
+            workers = int(next(args))
+        elif arg == "--grid":
+            specs.append(next(args))
+        elif arg == "--out":
+            out = next(args)
+        else:
+            print(f"Неизвестный аргумент: {arg}")
+            return 2
+    if policy not in POLICIES:
+        print(f"Неизвестная политика: {policy} (есть: {', '.join(POLICIES)})")
+        return 2
+
+    try:
+        grid = parse_grid(specs)
+    except ValueError as e:
+        print(e)
+        return 2
+    started = time.perf_counter()
+    results = run_batch(grid, sessions, policy, max_seconds, workers)
+    wall = time.perf_counter() - started
+    for result in results:
+        seconds = result["seconds"]
+        print(f"{result['balance'] or 'по умолчанию'}: жизнь {seconds['p10']:.0f}/{seconds['p50']:.0f}/"
+              f"{seconds['p90']:.0f} с (p10/p50/p90), убийства {result['kills']['mean']}, "
+              f"монеты {result['money']['mean']}")
+        for level, causes in result["deaths_by_level"].items():
+            print(f"    уровень {level}: " + ", ".join(f"{cause} {count}" for cause, count in causes.items()))
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"policy": policy, "max_seconds": max_seconds, "wall_seconds": round(wall, 1),
+                   "results": results}, f, indent=4, ensure_ascii=False)
+    print(f"{len(grid) * sessions} сессий за {wall:.1f} с, результат в {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
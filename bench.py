@@ -0,0 +1,224 @@
+import json
+import math
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from archetypes import ARCHETYPES
+from render import SpriteCache, draw_enemies
+from simulation import World, spawn_enemy, SIM_DT
+
+# Нагрузочные замеры: фиксированные сцены со 100 - 100 000 врагов, лазер
+# под постоянным углом. Для каждой сцены отдельно меряются движение,
+# столкновения (перестройка сетки + проверка игрока), попадания лазера
+# и отрисовка слоя врагов. Результат - JSON, который сравнивается с
+# сохранённой базой: фаза, лучшее время которой выросло больше порога и при
+# этом больше чем на MIN_DELTA_MS, считается регрессией. Сравнивается
+# минимум, а не медиана: посторонняя нагрузка только добавляет время, и
+# медиана на одной и той же машине гуляет на десятки процентов. Маленькие
+# сцены повторяются чаще, все сцены прогоняются по кругу в ROUNDS заходов.
+# Между сценами меряется эталонная нагрузка (reference): если машина
+# сейчас медленнее, чем при записи базы, база растягивается во столько же раз.
+#
+#   python bench.py                      замер и сравнение с bench_baseline.json
+#   python bench.py --save-baseline      записать текущие замеры как базу
+#   python bench.py --sizes 100,1000 --repeat 20 --threshold 0.2 --min-delta 0.3
+
+WIDTH, HEIGHT = 1280, 720
+SIZES = (100, 1000, 10000, 100000)
+LASER_ANGLE = 0.3
+RESULT_FILE = "bench_results.json"
+BASELINE_FILE = "bench_baseline.json"
+PHASES = ("движение", "столкновения", "лазер", "отрисовка")
+MIN_DELTA_MS = 0.2
+ROUNDS = 5
+
+
+def build_scene(count, seed=0):
+    # Типы и характеристики берутся из spawn_enemy, а позиции разбрасываются
+    # по всей арене, чтобы лазер и сетка работали как в плотной игре.
+    # Вокруг игрока остаётся пустое кольцо - сцена не должна заканчиваться смертью.
+    world = World(WIDTH, HEIGHT, seed=seed)
+    for i in range(count):
+        spawn_enemy(world.enemies, ARCHETYPES.names[i % len(ARCHETYPES.names)], WIDTH, HEIGHT, world.rng)
+    enemies = world.enemies
+    rng = np.random.default_rng(seed)
+    angle = rng.uniform(0, 2 * math.pi, count)
+    distance = rng.uniform(150, math.hypot(WIDTH, HEIGHT) / 2, count)
+    px = world.player_x + world.player_size / 2
+    py = world.player_y + world.player_size / 2
+    enemies.x[:] = np.clip(px + np.cos(angle) * distance, -20, WIDTH)
+    enemies.y[:] = np.clip(py + np.sin(angle) * distance, -20, HEIGHT)
+    enemies.prev_x[:] = enemies.x
+    enemies.prev_y[:] = enemies.y
+    # Лазер не должен убивать: иначе каждый повтор шёл бы по другой сцене.
+    enemies.hp[:] = 1e12
+    enemies.version += 1
+    return world
+
+
+def timed(samples, action):
+    start = time.perf_counter_ns()
+    action()
+    samples.append(time.perf_counter_ns() - start)
+
+
+def bench_scene(world, repeat, screen, sprites, samples):
+    # Повторы одной сцены; времена дописываются в samples по фазам.
+    enemies = world.enemies
+    size = world.player_size
+    for _ in range(repeat):
+        enemies.x[:] = world.start_x
+        enemies.y[:] = world.start_y
+        timed(samples["движение"], lambda: world.steer_enemies(SIM_DT))
+        timed(samples["столкновения"], lambda: world.spatial().query_rect(
+            world.player_x, world.player_y, world.player_x + size, world.player_y + size))
+        world.events = []
+        timed(samples["лазер"], lambda: world._fire(LASER_ANGLE, SIM_DT))
+        screen.fill((0, 0, 0))
+        timed(samples["отрисовка"], lambda: draw_enemies(screen, sprites, enemies, world.archetypes, 0.5))
+
+
+def reference(samples, data):
+    # Эталон: та же смесь, что в фазах - numpy над массивом и цикл Python.
+    start = time.perf_counter_ns()
+    np.sort(data)
+    total = 0
+    for i in range(20000):
+        total += i * i
+    samples.append(time.perf_counter_ns() - start)
+
+
+def summarize(samples):
+    result = {}
+    for phase, values in samples.items():
+        ms = np.array(values) / 1e6
+        result[phase] = {
+            "median_ms": round(float(np.median(ms)), 4),
+            "p95_ms": round(float(np.percentile(ms, 95)), 4),
+            "min_ms": round(float(ms.min()), 4),
+        }
+    return result
+
+
+def run(sizes=SIZES, repeat=30):
+    pygame.display.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    sprites = SpriteCache()
+    worlds = {}
+    for count in sizes:
+        world = build_scene(count)
+        world.start_x = world.enemies.x.copy()
+        world.start_y = world.enemies.y.copy()
+        worlds[count] = world
+
+    # Сцены идут по кругу в несколько заходов: медленный период машины
+    # задевает все сцены понемногу, а не одну целиком.
+    samples = {count: {phase: [] for phase in PHASES} for count in sizes}
+    reference_samples = []
+    reference_data = np.random.default_rng(0).random(200000)
+    for _ in range(ROUNDS):
+        for count in sizes:
+            for _ in range(5):
+                reference(reference_samples, reference_data)
+            # Больше повторов на маленьких сценах (шумнее), меньше на огромных,
+            # чтобы прогон не длился минутами.
+            scene_repeat = max(20, min(repeat * 10, repeat * 10000 // max(count, 1)))
+            # Прогрев перед каждым заходом: предыдущая большая сцена вытесняет
+            # эту из кэша, первый проход после неё в замер не идёт.
+            bench_scene(worlds[count], 1, screen, sprites, {phase: [] for phase in PHASES})
+            bench_scene(worlds[count], max(2, scene_repeat // ROUNDS), screen, sprites, samples[count])
+
+    results = {}
+    for count in sizes:
+        results[str(count)] = summarize(samples[count])
+        print(f"{count:>7} врагов: " + ", ".join(
+            f"{phase} {values['min_ms']:.3f} мс" for phase, values in results[str(count)].items()))
+    pygame.display.quit()
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "reference_ms": round(min(reference_samples) / 1e6, 4),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold, min_delta=MIN_DELTA_MS):
+    # Сравниваются минимумы; возвращается список регрессий.
+    scale = 1.0
+    if baseline.get("reference_ms"):
+        scale = report["reference_ms"] / baseline["reference_ms"]
+        print(f"Эталон {baseline['reference_ms']:.3f} -> {report['reference_ms']:.3f} мс, база x{scale:.2f}")
+    regressions = []
+    for count, phases in report["results"].items():
+        base_phases = baseline.get("results", {}).get(count)
+        if base_phases is None:
+            continue
+        for phase, values in phases.items():
+            base = base_phases.get(phase)
+            if base is None or base["min_ms"] <= 0:
+                continue
+            expected = base["min_ms"] * scale
+            ratio = values["min_ms"] / expected
+            marker = ""
+            if ratio > 1 + threshold and values["min_ms"] - expected > min_delta:
+                regressions.append((count, phase, ratio))
+                marker = "  <-- регрессия"
+            print(f"{count:>7} {phase:<13}{expected:9.3f} -> {values['min_ms']:9.3f} мс"
+                  f" ({ratio - 1:+.0%}){marker}")
+    return regressions
+
+
+def main(argv):
+    sizes = SIZES
+    repeat = 30
+    threshold = 0.15
+    min_delta = MIN_DELTA_MS
+    save_baseline = False
+    args = iter(argv)
+    for arg in args:
+        if arg == "--sizes":
+            sizes = tuple(int(size) for size in next(args).split(","))
+        elif arg == "--repeat":
+            repeat = int(next(args))
+        elif arg == "--threshold":
+            threshold = float(next(args))
+        elif arg == "--min-delta":
+            min_delta = float(next(args))
+        elif arg == "--save-baseline":
+            save_baseline = True
+        else:
+            print(f"Неизвестный аргумент: {arg}")
+            return 2
+
+    report = run(sizes, repeat)
+    with open(RESULT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+
+    if save_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"База сохранена в {BASELINE_FILE}")
+        return 0
+    if not os.path.exists(BASELINE_FILE):
+        print(f"Нет {BASELINE_FILE}, сравнивать не с чем (запустите с --save-baseline)")
+        return 0
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, threshold, min_delta)
+    if regressions:
+        print(f"Регрессий: {len(regressions)} (порог {threshold:.0%} и {min_delta} мс)")
+        return 1
+    print("Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
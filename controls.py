@@ -0,0 +1,131 @@
+import math
+
+import pygame
+
+from simulation import Inputs
+
+MOUSE_ID = -1
+
+# Слой ввода между очередью событий pygame и симуляцией.
+# - В очередь попадают только события, нужные текущему экрану
+#   (configure() вызывает set_blocked/set_allowed при смене экрана).
+# - Каждый палец (и мышь с зажатой кнопкой, id MOUSE_ID) привязывается к
+#   джойстику, который он захватил: отпускание пальца отпускает только его
+#   джойстик.
+# - Движения за кадр сливаются: к джойстику применяется только последняя
+#   позиция каждого пальца.
+# - snapshot() собирает из этого один Inputs на кадр для всех шагов симуляции.
+
+BASE_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+               pygame.WINDOWFOCUSLOST)
+JOYSTICK_EVENTS = (pygame.MOUSEMOTION, pygame.FINGERDOWN, pygame.FINGERUP, pygame.FINGERMOTION)
+
+
+class InputLayer:
+    def __init__(self):
+        self.joysticks = []
+        self.fingers = {}
+        self._motion = {}
+        self._allowed = None
+        self.mouse_held = False
+        self.clicked = False
+        self.key_presses = []
+        self.quit = False
+
+    def set_joysticks(self, *joysticks):
+        self.release_all()
+        self.joysticks = list(joysticks)
+
+    def configure(self, state, control_mode):
+        joystick = state == "playing" and control_mode == "joystick"
+        if joystick != self._allowed:
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed(BASE_EVENTS + JOYSTICK_EVENTS if joystick else BASE_EVENTS)
+            self._allowed = joystick
+            self.release_all()
+
+    def release_all(self):
+        for joystick in self.joysticks:
+            joystick.reset()
+        self.fingers.clear()
+        self._motion.clear()
+
+    def poll(self, target):
+        # target - render.RenderTarget: события приходят в координатах окна.
+        to_surface = target.to_surface
+        width, height = target.window_size()
+        self.clicked = False
+        self.key_presses = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit = True
+            elif event.type == pygame.KEYDOWN:
+                self.key_presses.append(event.key)
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                self.mouse_held = False
+                self.release_all()
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.clicked = True
+                self.mouse_held = True
+                # Касания дублируются SDL мышиными событиями, их уже обработал FINGER*.
+                if not getattr(event, "touch", False):
+                    self._press(MOUSE_ID, to_surface(event.pos))
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                self.mouse_held = False
+                if not getattr(event, "touch", False):
+                    self._release(MOUSE_ID)
+            elif event.type == pygame.MOUSEMOTION:
+                if event.buttons[0] and not getattr(event, "touch", False):
+                    self._motion[MOUSE_ID] = to_surface(event.pos)
+            elif event.type == pygame.FINGERDOWN:
+                self._press(event.finger_id, to_surface((event.x * width, event.y * height)))
+            elif event.type == pygame.FINGERUP:
+                self._release(event.finger_id)
+            elif event.type == pygame.FINGERMOTION:
+                self._motion[event.finger_id] = to_surface((event.x * width, event.y * height))
+
+        for finger, pos in self._motion.items():
+            joystick = self.fingers.get(finger)
+            # За середину экрана джойстик не тянется, остаётся на последней позиции.
+            if joystick is not None and joystick.can_control(pos):
+                joystick.update(pos, finger)
+        self._motion.clear()
+
+    def _press(self, finger, pos):
+        if finger in self.fingers:
+            return
+        for joystick in self.joysticks:
+            if not joystick.active and joystick.update(pos, finger):
+                self.fingers[finger] = joystick
+                return
+
+    def _release(self, finger):
+        self._motion.pop(finger, None)
+        joystick = self.fingers.pop(finger, None)
+        if joystick is not None:
+            joystick.reset()
+
+    def snapshot(self, control_mode, player_center, mouse_pos):
+        inputs = Inputs()
+        if control_mode == "keyboard":
+            keys = pygame.key.get_pressed()
+            if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+                inputs.move_x -= 1
+            if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+                inputs.move_x += 1
+            if keys[pygame.K_UP] or keys[pygame.K_w]:
+                inputs.move_y -= 1
+            if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+                inputs.move_y += 1
+            if self.mouse_held:
+                inputs.shooting = True
+                inputs.angle = math.atan2(mouse_pos[1] - player_center[1], mouse_pos[0] - player_center[0])
+        else:
+            move, aim = self.joysticks
+            if move.active:
+                inputs.move_x = move.normalized_dx * 1.5
+                inputs.move_y = move.normalized_dy * 1.5
+            if aim.active and (aim.normalized_dx != 0 or aim.normalized_dy != 0):
+                inputs.shooting = True
+                inputs.angle = math.atan2(aim.normalized_dy, aim.normalized_dx)
+        return inputs
@@ -0,0 +1,137 @@
+import numpy as np
+
+from simulation import World, Inputs, PLAYER_SIZE, PLAYER_SPEED
+
+# Мир на 2-4 игроков для сервера (netcode.py). Враги, уровни и таймеры -
+# те же, что в World; отличаются игроки: у каждого своё положение, щит,
+# луч и счёт убийств. Враги идут к ближайшему живому игроку. Убитый игрок
+# остаётся на арене зрителем, сессия кончается, когда погибли все.
+#
+# Поля player_x/player_y самого World здесь не используются.
+
+MAX_PLAYERS = 4
+
+
+class CoopPlayer:
+    def __init__(self, player_id, x, y, has_shield=False):
+        self.id = player_id
+        self.x = x
+        self.y = y
+        self.prev_x = x
+        self.prev_y = y
+        self.has_shield = has_shield
+        self.alive = True
+        self.kills = 0
+        # Угол луча в этом шаге, None - не стреляет.
+        self.laser_angle = None
+        self.laser = None
+        # Номер последнего применённого входа клиента (для предсказания).
+        self.input_seq = 0
+
+    def center(self):
+        return self.x + PLAYER_SIZE / 2, self.y + PLAYER_SIZE / 2
+
+
+def move_player(player, inputs, width, height, dt):
+    # То же движение, что в World.step; клиент повторяет его для предсказания.
+    player.prev_x = player.x
+    player.prev_y = player.y
+    player.x += inputs.move_x * PLAYER_SPEED * dt
+    player.y += inputs.move_y * PLAYER_SPEED * dt
+    player.x = max(0, min(width - PLAYER_SIZE, player.x))
+    player.y = max(0, min(height - PLAYER_SIZE, player.y))
+
+
+class CoopWorld(World):
+    def reset(self, has_shield=False, seed=None):
+        super().reset(has_shield, seed)
+        self.players = {}
+
+    def add_player(self, player_id=None):
+        # Новый игрок появляется на окружности вокруг центра арены.
+        if len(self.players) >= MAX_PLAYERS:
+            return None
+        if player_id is None:
+            player_id = min(set(range(MAX_PLAYERS)) - set(self.players))
+        angle = player_id * np.pi / 2
+        x = self.width / 2 + float(np.cos(angle)) * 80 - PLAYER_SIZE / 2
+        y = self.height / 2 + float(np.sin(angle)) * 80 - PLAYER_SIZE / 2
+        player = CoopPlayer(player_id, x, y, self.has_shield)
+        self.players[player_id] = player
+        return player
+
+    def remove_player(self, player_id):
+        self.players.pop(player_id, None)
+
+    def living(self):
+        return [player for player in self.players.values() if player.alive]
+
+    def step(self, inputs, dt):
+        # inputs - {id игрока: Inputs}; у кого входа нет, стоит на месте.
+        self.events = []
+        if not self.alive:
+            return self.events
+        self.tick += 1
+        self.scheduler.advance(dt)
+
+        no_input = Inputs()
+        for player in self.living():
+            player_inputs = inputs.get(player.id, no_input)
+            move_player(player, player_inputs, self.width, self.height, dt)
+            player.laser_angle = player_inputs.angle if player_inputs.shooting else None
+        self.session_score = self.kills + self.elapsed_seconds // 2
+
+        self.active_laser = None
+        for player in self.living():
+            player.laser = None
+            if player.laser_angle is None:
+                continue
+            player.laser = {'start': player.center()}
+            self.events.append(("shoot", player.id))
+            killed, score = self._laser(player.laser, player.laser_angle, dt)
+            if killed:
+                player.kills += killed
+                self.money += score
+                self.kills += killed
+                self.events.append(("kill", killed, score, player.id))
+
+        self._run_timers()
+        self.peak_enemies = max(self.peak_enemies, len(self.enemies))
+        self._move_enemies(dt)
+        return self.events
+
+    def steer_enemies(self, dt):
+        players = self.living()
+        if not players:
+            return
+        centers = np.array([player.center() for player in players])
+        enemies = self.enemies
+        cx, cy = enemies.centers()
+        dir_x, dir_y = self.steering.directions(cx, cy, centers[:, 0], centers[:, 1])
+        enemies.move(dir_x, dir_y, dt)
+
+    def _move_enemies(self, dt):
+        enemies = self.enemies
+        if enemies:
+            self.steer_enemies(dt)
+        for player in self.living():
+            if not enemies:
+                break
+            hits = np.sort(self.spatial().query_rect(player.x, player.y,
+                                                     player.x + PLAYER_SIZE, player.y + PLAYER_SIZE))
+            if not len(hits):
+                continue
+            if player.has_shield:
+                player.has_shield = False
+                self.events.append(("shield_lost", player.id))
+                enemies.remove(hits[0])
+                # remove() сдвигает врагов после hits[0] на одно место к началу.
+                hits = hits[1:] - 1
+            if len(hits):
+                player.alive = False
+                player.laser = None
+                self.killed_by = self.archetypes.names[int(enemies.type_id[hits[0]])]
+                self.events.append(("player_death", player.id, self.killed_by))
+        if self.players and not self.living():
+            self.alive = False
+            self.events.append(("death", self.session_score, self.elapsed_seconds))
@@ -0,0 +1,119 @@
+import sys
+
+import pygame
+
+from archetypes import ARCHETYPES
+from controls import InputLayer
+from netcode import Client, DEFAULT_PORT, PLAYER_ALIVE, PLAYER_SHIELD
+from render import RenderTarget, SpriteCache, build_enemy_sprites, rect_outline
+from simulation import PLAYER_SIZE
+from textcache import TextCache, format_time
+
+# Клиент совместной игры: python coop_client.py [адрес сервера] [--port N]
+# Управление - клавиатура и мышь, как в режиме "keyboard" основной игры.
+# Файл archetypes.json у клиента и сервера должен совпадать: по нему
+# клиент знает цвета и размеры врагов.
+
+BACKGROUND = (20, 20, 35)
+RAY_COLOR = (100, 255, 200)
+TEXT_COLOR = (220, 220, 255)
+SHIELD_COLOR = (50, 150, 255)
+DEAD_COLOR = (90, 90, 110)
+# Цвета игроков по номеру, свой - первый из основной игры.
+PLAYER_COLORS = ((100, 200, 255), (255, 180, 80), (180, 255, 120), (240, 120, 240))
+FPS = 60
+
+
+def main(argv):
+    host = "127.0.0.1"
+    port = DEFAULT_PORT
+    args = iter(argv)
+    for arg in args:
+        if arg == "--port":
+            port = int(next(args))
+        else:
+            host = arg
+
+    client = Client(host, port)
+    try:
+        player_id = client.connect()
+    except ConnectionError as error:
+        print(error)
+        return 1
+    print(f"Подключено к {host}:{port}, вы - игрок {player_id}")
+
+    pygame.display.init()
+    pygame.font.init()
+    window = pygame.display.set_mode((client.width, client.height))
+    pygame.display.set_caption(f"Cyber - Arena: совместная игра (игрок {player_id})")
+    target = RenderTarget((client.width, client.height), "native")
+    screen = target.set_window(window)
+    font = pygame.font.SysFont(None, 36)
+    text_cache = TextCache()
+    sprites = SpriteCache()
+    enemy_sprites = sprites.get("enemies", lambda: build_enemy_sprites(ARCHETYPES))
+    shield_ring = rect_outline(SHIELD_COLOR, PLAYER_SIZE + 10, 3)
+    controls = InputLayer()
+    controls.configure("playing", "keyboard")
+    clock = pygame.time.Clock()
+    accumulator = 0.0
+
+    while not controls.quit:
+        frame_seconds = min(clock.tick(FPS) / 1000, 0.25)
+        controls.poll(target)
+        if pygame.K_ESCAPE in controls.key_presses:
+            break
+        client.poll()
+
+        # Входы уходят с шагом симуляции сервера, независимо от частоты кадров.
+        accumulator += frame_seconds
+        while accumulator >= client.dt:
+            accumulator -= client.dt
+            center = (0, 0)
+            if client.predicted is not None:
+                center = client.predicted.center()
+            mouse_pos = target.to_surface(pygame.mouse.get_pos())
+            client.send_input(controls.snapshot("keyboard", center, mouse_pos))
+
+        screen.fill(BACKGROUND)
+        view = client.view(frame_seconds)
+        if view is None:
+            screen.blit(text_cache.render(font, "Ожидание сервера...", TEXT_COLOR), (20, 20))
+            target.flip()
+            continue
+        frame, players, enemy_x, enemy_y, type_id = view
+        screen.blits(list(zip(map(enemy_sprites.__getitem__, type_id.tolist()),
+                              zip(enemy_x.tolist(), enemy_y.tolist()))), doreturn=False)
+
+        predicted = client.predicted
+        alpha = accumulator / client.dt
+        for pid, flags, x, y, kills, laser in players:
+            if pid == player_id and predicted is not None:
+                # Свой игрок - между двумя последними предсказанными шагами.
+                x = predicted.prev_x + (predicted.x - predicted.prev_x) * alpha
+                y = predicted.prev_y + (predicted.y - predicted.prev_y) * alpha
+            if laser is not None:
+                pygame.draw.line(screen, RAY_COLOR, laser[0], laser[1], 3)
+            color = PLAYER_COLORS[pid % len(PLAYER_COLORS)] if flags & PLAYER_ALIVE else DEAD_COLOR
+            pygame.draw.rect(screen, color, (x, y, PLAYER_SIZE, PLAYER_SIZE))
+            if flags & PLAYER_SHIELD:
+                screen.blit(shield_ring, (x - 5, y - 5))
+
+        kills, money, score, time_ms, level, alive = frame.stats
+        lines = [f"Убийства: {kills}", f"Время: {format_time(time_ms // 1000)}", f"Очки: {score}", f"Уровень: {level}"]
+        lines += [f"Игрок {pid}: {kills}" + ("" if flags & PLAYER_ALIVE else " (выбыл)")
+                  for pid, flags, x, y, kills, laser in players]
+        for i, line in enumerate(lines):
+            screen.blit(text_cache.render(font, line, TEXT_COLOR), (20, 20 + i * 40))
+        if not alive:
+            text = text_cache.render(font, "Все игроки погибли, новая сессия через несколько секунд", TEXT_COLOR)
+            screen.blit(text, (client.width // 2 - text.get_width() // 2, client.height // 2))
+        target.flip()
+
+    client.close()
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+import numpy as np
+
+# Враги хранятся не списком словарей, а параллельными массивами
+# (struct-of-arrays): движение и столкновения считаются одной операцией
+# на весь массив, удаление - сжатием по маске.
+
+# type_id - номер типа в таблицах archetypes.py. uid - постоянный номер
+# врага в сессии: новые враги получают возрастающие номера, а сжатие
+# сохраняет порядок, поэтому uid в хранилище всегда отсортированы
+# (на этом строятся дельта-снимки в netcode.py).
+FIELDS = (
+    ("x", np.float64),
+    ("y", np.float64),
+    ("prev_x", np.float64),
+    ("prev_y", np.float64),
+    ("size", np.float64),
+    ("speed", np.float64),
+    ("hp", np.float64),
+    ("type_id", np.int16),
+    ("score_value", np.int32),
+    ("uid", np.int64),
+)
+
+
+class EnemyStore:
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.next_uid = 0
+        # Растёт при любом изменении позиций или состава - по нему
+        # пространственная сетка понимает, что её пора перестроить.
+        self.version = 0
+        self.capacity = capacity
+        self._arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in FIELDS}
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    # Срезы - это представления, поэтому запись в store.x[...] меняет хранилище.
+    @property
+    def x(self):
+        return self._arrays["x"][:self.count]
+
+    @property
+    def y(self):
+        return self._arrays["y"][:self.count]
+
+    @property
+    def prev_x(self):
+        return self._arrays["prev_x"][:self.count]
+
+    @property
+    def prev_y(self):
+        return self._arrays["prev_y"][:self.count]
+
+    @property
+    def size(self):
+        return self._arrays["size"][:self.count]
+
+    @property
+    def speed(self):
+        return self._arrays["speed"][:self.count]
+
+    @property
+    def hp(self):
+        return self._arrays["hp"][:self.count]
+
+    @property
+    def type_id(self):
+        return self._arrays["type_id"][:self.count]
+
+    @property
+    def score_value(self):
+        return self._arrays["score_value"][:self.count]
+
+    @property
+    def uid(self):
+        return self._arrays["uid"][:self.count]
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name, dtype in FIELDS:
+            arr = np.zeros(capacity, dtype=dtype)
+            arr[:self.count] = self._arrays[name][:self.count]
+            self._arrays[name] = arr
+        self.capacity = capacity
+
+    def add(self, type_id, x, y, size, speed, hp, score_value):
+        if self.count >= self.capacity:
+            self._grow(self.count + 1)
+        i = self.count
+        a = self._arrays
+        a["x"][i] = x
+        a["y"][i] = y
+        a["prev_x"][i] = x
+        a["prev_y"][i] = y
+        a["size"][i] = size
+        a["speed"][i] = speed
+        a["hp"][i] = hp
+        a["type_id"][i] = type_id
+        a["score_value"][i] = score_value
+        a["uid"][i] = self.next_uid
+        self.next_uid += 1
+        self.count += 1
+        self.version += 1
+        return i
+
+    def clear(self):
+        self.count = 0
+        self.version += 1
+
+    def compact(self, keep):
+        # keep - булева маска длины count; оставшиеся враги сдвигаются в начало.
+        kept = int(np.count_nonzero(keep))
+        if kept == self.count:
+            return
+        for name, _ in FIELDS:
+            arr = self._arrays[name]
+            arr[:kept] = arr[:self.count][keep]
+        self.count = kept
+        self.version += 1
+
+    def remove(self, index):
+        keep = np.ones(self.count, dtype=bool)
+        keep[index] = False
+        self.compact(keep)
+
+    def centers(self):
+        half = self.size / 2
+        return self.x + half, self.y + half
+
+    def interpolated(self, alpha):
+        # Позиции для отрисовки между двумя последними шагами симуляции.
+        px = self.prev_x
+        py = self.prev_y
+        return px + (self.x - px) * alpha, py + (self.y - py) * alpha
+
+    def move(self, dir_x, dir_y, dt):
+        # dir_x/dir_y - направления (длина не больше 1), см. steering.py.
+        step = self.speed * dt
+        x = self.x
+        y = self.y
+        self.prev_x[:] = x
+        self.prev_y[:] = y
+        x += dir_x * step
+        y += dir_y * step
+        self.version += 1
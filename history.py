@@ -0,0 +1,99 @@
+import sqlite3
+import time
+
+HISTORY_FILE = "history.db"
+
+# Каждая сессия - одна строка, запись O(1) и не переписывает файл целиком.
+# Итоги (totals) - одна строка, обновляемая в той же транзакции, поэтому
+# при запуске их не нужно пересчитывать по всей истории.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    ended_at REAL NOT NULL,
+    score INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    money INTEGER NOT NULL,
+    max_level INTEGER NOT NULL,
+    peak_enemies INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_score ON sessions (score DESC);
+CREATE INDEX IF NOT EXISTS sessions_by_time ON sessions (ended_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_score INTEGER NOT NULL,
+    total_playtime_seconds INTEGER NOT NULL,
+    total_deaths INTEGER NOT NULL,
+    sessions_played INTEGER NOT NULL,
+    best_session_score INTEGER NOT NULL
+);
+"""
+
+SESSION_COLUMNS = ("ended_at", "score", "duration", "kills", "money", "max_level", "peak_enemies")
+TOTAL_COLUMNS = ("total_score", "total_playtime_seconds", "total_deaths",
+                 "sessions_played", "best_session_score")
+
+
+class SessionHistory:
+    def __init__(self, path=HISTORY_FILE):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def totals(self):
+        row = self.db.execute(
+            f"SELECT {', '.join(TOTAL_COLUMNS)} FROM totals WHERE id = 0").fetchone()
+        if row is None:
+            return None
+        return dict(zip(TOTAL_COLUMNS, row))
+
+    def seed_totals(self, stats):
+        # Перенос итогов из старого savedata.json, если истории ещё нет.
+        with self.db:
+            self.db.execute(
+                f"INSERT OR IGNORE INTO totals (id, {', '.join(TOTAL_COLUMNS)}) VALUES (0, ?, ?, ?, ?, ?)",
+                [stats.get(name, 0) for name in TOTAL_COLUMNS])
+
+    def record(self, score, duration, kills, money, max_level, peak_enemies, ended_at=None):
+        if ended_at is None:
+            ended_at = time.time()
+        with self.db:
+            self.db.execute(
+                f"INSERT INTO sessions ({', '.join(SESSION_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ended_at, score, duration, kills, money, max_level, peak_enemies))
+            self.db.execute("INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0, 0, 0)")
+            self.db.execute(
+                "UPDATE totals SET total_score = total_score + ?,"
+                " total_playtime_seconds = total_playtime_seconds + ?,"
+                " total_deaths = total_deaths + 1,"
+                " sessions_played = sessions_played + 1,"
+                " best_session_score = MAX(best_session_score, ?) WHERE id = 0",
+                (score, duration, score))
+        return self.totals()
+
+    def _rows(self, query, params):
+        return [dict(zip(SESSION_COLUMNS, row)) for row in self.db.execute(query, params)]
+
+    def best(self, n=10):
+        return self._rows(
+            f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions ORDER BY score DESC LIMIT ?", (n,))
+
+    def between(self, start, end):
+        return self._rows(
+            f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions"
+            " WHERE ended_at >= ? AND ended_at < ? ORDER BY ended_at", (start, end))
+
+
+if __name__ == "__main__":
+    history = SessionHistory()
+    print(history.totals())
+    for i, session in enumerate(history.best(10), 1):
+        ended = time.strftime("%Y-%m-%d %H:%M", time.localtime(session["ended_at"]))
+        print(f"{i:2d}. {session['score']:6d} очков, {session['duration']} с, "
+              f"{session['kills']} убийств, уровень {session['max_level']}, {ended}")
+    history.close()
@@ -0,0 +1,779 @@
+import math
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from collections import deque
+
+import numpy as np
+
+from coop import CoopWorld, CoopPlayer, move_player, MAX_PLAYERS
+from simulation import Inputs, SIM_DT, PLAYER_SIZE, ARENA_MARGIN, clip_segment, spawn_enemy
+
+# Совместная игра по UDP: сервер ведёт CoopWorld и рассылает снимки,
+# клиенты шлют только входы.
+#
+# Входы. Клиент шлёт по входу на каждый шаг симуляции (номер seq, движение
+# и угол, квантованные в байты) и повторяет в пакете последние
+# INPUT_REDUNDANCY входов, чтобы потеря одного пакета ничего не стоила.
+# Сервер применяет по одному входу клиента за шаг.
+#
+# Снимки. Раз в snapshot_every шагов сервер собирает снимок: игроки
+# (float32, их мало), враги - uid, тип и позиция в 1/4 пикселя (uint16).
+# Снимок для клиента кодируется разницей с последним снимком, который
+# этот клиент подтвердил (ack в пакете входов): битовая маска выживших
+# врагов базового снимка, сдвиги их позиций (int8, если все помещаются,
+# иначе int16) и полные записи новых врагов. Если база неизвестна или
+# устарела, снимок уходит целиком (та же разница с пустым снимком).
+# Раздел врагов дополнительно жмётся zlib, если так выходит короче.
+#
+# Клиент: свой игрок предсказывается (входы применяются сразу, а после
+# каждого снимка неподтверждённые входы повторяются от позиции сервера),
+# остальные игроки и враги показываются с задержкой в два снимка и
+# интерполируются между соседними снимками.
+#
+#   python netcode.py server [--port 47800] [--crowd 300]
+#   python netcode.py loopback --players 3 --seconds 30 [--crowd 300] [--loss 0.1]
+#
+# loopback поднимает сервер и ботов-клиентов в одном процессе через
+# 127.0.0.1 и печатает отчёт по трафику и времени шага сервера.
+
+PROTOCOL = 1
+DEFAULT_PORT = 47800
+
+MSG_JOIN = 1
+MSG_WELCOME = 2
+MSG_FULL = 3
+MSG_INPUT = 4
+MSG_SNAPSHOT = 5
+MSG_LEAVE = 6
+
+HEADER = struct.Struct("<BB")
+JOIN = struct.Struct("<BBI")
+WELCOME = struct.Struct("<BBIBHHfB")
+INPUT_HEADER = struct.Struct("<BBIB")
+INPUT_ITEM = struct.Struct("<IbbBH")
+SNAPSHOT_HEADER = struct.Struct("<BBIIIIIIIBBBB")
+PLAYER_ITEM = struct.Struct("<BBffHH")
+ENEMY_HEADER = struct.Struct("<HHB")
+ADDED_ENEMY = np.dtype([("uid", "<u4"), ("type", "u1"), ("x", "<u2"), ("y", "<u2")])
+
+NO_BASE = 0xFFFFFFFF
+# Позиции врагов: (x + POS_OFFSET) * POS_SCALE в uint16.
+POS_OFFSET = 64
+POS_SCALE = 4
+ANGLE_STEPS = 65536
+MOVE_SCALE = 64
+INPUT_REDUNDANCY = 4
+HISTORY = 64
+# Входов в очереди игрока больше этого - клиент убежал вперёд, старые выкидываются.
+MAX_QUEUED_INPUTS = 4
+CLIENT_TIMEOUT = 5.0
+RESTART_SECONDS = 3.0
+MAX_DATAGRAM = 65000
+
+PLAYER_ALIVE = 1
+PLAYER_SHIELD = 2
+PLAYER_SHOOTING = 4
+WORLD_ALIVE = 1
+ENEMIES_COMPRESSED = 2
+
+
+def quantize_positions(values):
+    return np.clip(np.rint((values + POS_OFFSET) * POS_SCALE), 0, 65535).astype(np.int32)
+
+
+def positions(quantized):
+    return quantized / POS_SCALE - POS_OFFSET
+
+
+def quantize_angle(angle):
+    return int(round(angle / (2 * math.pi) * ANGLE_STEPS)) % ANGLE_STEPS
+
+
+def quantize_input(inputs):
+    # (движение x, движение y, стрельба, угол) в том виде, в каком их увидит сервер.
+    move_x = int(round(max(-1.98, min(1.98, inputs.move_x)) * MOVE_SCALE))
+    move_y = int(round(max(-1.98, min(1.98, inputs.move_y)) * MOVE_SCALE))
+    shooting = inputs.shooting and inputs.angle is not None
+    return move_x, move_y, int(shooting), quantize_angle(inputs.angle) if shooting else 0
+
+
+def input_from(quantized):
+    move_x, move_y, shooting, angle = quantized
+    return Inputs(move_x / MOVE_SCALE, move_y / MOVE_SCALE, bool(shooting),
+                  angle * 2 * math.pi / ANGLE_STEPS if shooting else None)
+
+
+class Frame:
+    # Один снимок: общий счёт, игроки и враги (uid по возрастанию).
+    def __init__(self, tick, session, stats, players, uid, type_id, qx, qy):
+        self.tick = tick
+        self.session = session
+        self.stats = stats
+        self.players = players
+        self.uid = uid
+        self.type_id = type_id
+        self.qx = qx
+        self.qy = qy
+        self.x = positions(qx)
+        self.y = positions(qy)
+
+
+EMPTY_FRAME = Frame(NO_BASE, 0, None, [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8),
+                    np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+
+
+def capture(world, tick, session):
+    enemies = world.enemies
+    players = []
+    for player in world.players.values():
+        flags = (PLAYER_ALIVE if player.alive else 0) | (PLAYER_SHIELD if player.has_shield else 0)
+        angle = 0
+        if player.laser_angle is not None and player.alive:
+            flags |= PLAYER_SHOOTING
+            angle = quantize_angle(player.laser_angle)
+        players.append((player.id, flags, player.x, player.y, angle, min(player.kills, 65535)))
+    stats = (world.kills, world.money, world.session_score, int(world.time * 1000), world.upgrade_level, int(world.alive))
+    return Frame(tick, session, stats, players, enemies.uid.copy(), enemies.type_id.astype(np.uint8),
+                 quantize_positions(enemies.x), quantize_positions(enemies.y))
+
+
+def encode_enemies(base, frame):
+    # Оба списка uid отсортированы, поэтому выжившие враги базы и те же
+    # враги текущего снимка идут в одном порядке.
+    kept = np.isin(base.uid, frame.uid, assume_unique=True)
+    present = np.isin(frame.uid, base.uid, assume_unique=True)
+    dx = frame.qx[present] - base.qx[kept]
+    dy = frame.qy[present] - base.qy[kept]
+    deltas = np.empty(2 * len(dx), dtype=np.int32)
+    deltas[0::2] = dx
+    deltas[1::2] = dy
+    wide = len(deltas) and (deltas.min() < -128 or deltas.max() > 127)
+    added = ~present
+    records = np.empty(int(np.count_nonzero(added)), dtype=ADDED_ENEMY)
+    records["uid"] = frame.uid[added]
+    records["type"] = frame.type_id[added]
+    records["x"] = frame.qx[added]
+    records["y"] = frame.qy[added]
+    return b"".join([
+        ENEMY_HEADER.pack(len(base.uid), len(records), 2 if wide else 1),
+        np.packbits(kept, bitorder="little").tobytes(),
+        deltas.astype("<i2" if wide else "i1").tobytes(),
+        records.tobytes(),
+    ])
+
+
+def decode_enemies(base, data):
+    base_count, added_count, width = ENEMY_HEADER.unpack_from(data)
+    if base_count != len(base.uid):
+        raise ValueError("Снимок закодирован от другой базы")
+    offset = ENEMY_HEADER.size
+    mask_bytes = (base_count + 7) // 8
+    kept = np.unpackbits(np.frombuffer(data, np.uint8, mask_bytes, offset),
+                         count=base_count, bitorder="little").astype(bool)
+    offset += mask_bytes
+    count = int(np.count_nonzero(kept))
+    deltas = np.frombuffer(data, "<i2" if width == 2 else "i1", 2 * count, offset).astype(np.int32)
+    offset += 2 * count * width
+    records = np.frombuffer(data, ADDED_ENEMY, added_count, offset)
+    return (np.concatenate([base.uid[kept], records["uid"].astype(np.int64)]),
+            np.concatenate([base.type_id[kept], records["type"]]),
+            np.concatenate([base.qx[kept] + deltas[0::2], records["x"].astype(np.int32)]),
+            np.concatenate([base.qy[kept] + deltas[1::2], records["y"].astype(np.int32)]))
+
+
+def encode_snapshot(frame, base, input_seq):
+    section = encode_enemies(base or EMPTY_FRAME, frame)
+    flags = frame.stats[5] and WORLD_ALIVE
+    if len(section) > 256:
+        packed = zlib.compress(section, 1)
+        if len(packed) < len(section):
+            section = packed
+            flags |= ENEMIES_COMPRESSED
+    kills, money, score, time_ms, level, alive = frame.stats
+    parts = [SNAPSHOT_HEADER.pack(PROTOCOL, MSG_SNAPSHOT, frame.tick, base.tick if base else NO_BASE, input_seq,
+                                  kills, money, score, time_ms, level, frame.session, flags, len(frame.players))]
+    parts.extend(PLAYER_ITEM.pack(*player) for player in frame.players)
+    parts.append(section)
+    return b"".join(parts)
+
+
+def decode_snapshot(data, frames):
+    # frames - {tick: Frame} уже принятых снимков. Возвращает (Frame, seq
+    # последнего применённого входа) или None, если базы нет.
+    (protocol, kind, tick, base_tick, input_seq, kills, money, score, time_ms,
+     level, session, flags, player_count) = SNAPSHOT_HEADER.unpack_from(data)
+    base = EMPTY_FRAME if base_tick == NO_BASE else frames.get(base_tick)
+    if base is None:
+        return None
+    offset = SNAPSHOT_HEADER.size
+    players = []
+    for _ in range(player_count):
+        players.append(PLAYER_ITEM.unpack_from(data, offset))
+        offset += PLAYER_ITEM.size
+    section = data[offset:]
+    if flags & ENEMIES_COMPRESSED:
+        section = zlib.decompress(section)
+    uid, type_id, qx, qy = decode_enemies(base, section)
+    stats = (kills, money, score, time_ms, level, int(bool(flags & WORLD_ALIVE)))
+    return Frame(tick, session, stats, players, uid, type_id, qx, qy), input_seq
+
+
+class LossySocket:
+    # UDP-сокет, который может терять исходящие пакеты (проверка на loopback).
+    def __init__(self, loss=0.0, seed=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.sent_bytes = 0
+        self.received_bytes = 0
+
+    def sendto(self, data, address):
+        self.sent_bytes += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            return
+        try:
+            self.sock.sendto(data, address)
+        except (BlockingIOError, ConnectionError):
+            pass
+
+    def receive(self):
+        # Все пакеты, что уже пришли.
+        packets = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_DATAGRAM + 1024)
+            except (BlockingIOError, ConnectionError):
+                return packets
+            self.received_bytes += len(data)
+            packets.append((data, address))
+
+    def close(self):
+        self.sock.close()
+
+
+class ClientSlot:
+    def __init__(self, player_id, nonce, now):
+        self.player_id = player_id
+        self.nonce = nonce
+        self.inputs = deque()
+        self.last_input = Inputs()
+        self.last_seq = 0
+        self.acked = None
+        self.last_heard = now
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.joined = now
+
+
+class Server:
+    def __init__(self, host="0.0.0.0", port=DEFAULT_PORT, seed=None, snapshot_every=3,
+                 crowd=0, loss=0.0, dt=SIM_DT, width=1280, height=720):
+        self.socket = LossySocket(loss, seed)
+        self.socket.sock.bind((host, port))
+        self.address = self.socket.sock.getsockname()
+        self.dt = dt
+        self.snapshot_every = snapshot_every
+        self.crowd = crowd
+        self.seed = seed
+        self.sessions = 0
+        self.world = CoopWorld(width, height, seed=seed)
+        self.clients = {}
+        self.history = {}
+        self.tick = 0
+        self.restart_tick = None
+        self.stop_event = threading.Event()
+        # Замеры для отчёта.
+        self.step_times = []
+        self.encode_times = []
+        self.snapshot_sizes = {"full": [], "delta": []}
+        self.enemy_counts = []
+        self.oversize = 0
+        self.started = None
+        self.finished = None
+
+    def run(self, seconds=None):
+        self.started = time.perf_counter()
+        next_tick = self.started
+        while not self.stop_event.is_set():
+            now = time.perf_counter()
+            if seconds is not None and now - self.started >= seconds:
+                break
+            if now < next_tick:
+                time.sleep(min(next_tick - now, 0.002))
+                continue
+            self._receive(now)
+            self._tick(now)
+            next_tick += self.dt
+            # Сильно отставший сервер не догоняет пропущенные шаги пачкой.
+            if now - next_tick > 5 * self.dt:
+                next_tick = now
+        self.finished = time.perf_counter()
+        self.socket.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _receive(self, now):
+        for data, address in self.socket.receive():
+            if len(data) < HEADER.size:
+                continue
+            protocol, kind = HEADER.unpack_from(data)
+            if protocol != PROTOCOL:
+                continue
+            slot = self.clients.get(address)
+            if slot is not None:
+                slot.last_heard = now
+                slot.received_bytes += len(data)
+            if kind == MSG_JOIN and len(data) >= JOIN.size:
+                self._join(address, JOIN.unpack_from(data)[2], now)
+            elif kind == MSG_INPUT and slot is not None:
+                self._read_inputs(slot, data)
+            elif kind == MSG_LEAVE and slot is not None:
+                self.world.remove_player(slot.player_id)
+                del self.clients[address]
+        for address, slot in list(self.clients.items()):
+            if now - slot.last_heard > CLIENT_TIMEOUT:
+                print(f"Игрок {slot.player_id} отключился по таймауту")
+                self.world.remove_player(slot.player_id)
+                del self.clients[address]
+
+    def _join(self, address, nonce, now):
+        slot = self.clients.get(address)
+        if slot is None:
+            if not self.clients:
+                self._new_session()
+            player = self.world.add_player()
+            if player is None:
+                self.socket.sendto(HEADER.pack(PROTOCOL, MSG_FULL), address)
+                return
+            slot = self.clients[address] = ClientSlot(player.id, nonce, now)
+            print(f"Игрок {player.id} подключился: {address[0]}:{address[1]}")
+        # Повторный JOIN - клиент не получил ответ, шлём ещё раз.
+        self.socket.sendto(WELCOME.pack(PROTOCOL, MSG_WELCOME, slot.nonce, slot.player_id,
+                                        self.world.width, self.world.height, self.dt, self.snapshot_every), address)
+
+    def _read_inputs(self, slot, data):
+        # Обрезанный или испорченный пакет просто отбрасывается.
+        if len(data) < INPUT_HEADER.size:
+            return
+        protocol, kind, ack, count = INPUT_HEADER.unpack_from(data)
+        if len(data) < INPUT_HEADER.size + count * INPUT_ITEM.size:
+            return
+        if ack != NO_BASE and ack <= self.tick:
+            slot.acked = ack if slot.acked is None else max(slot.acked, ack)
+        offset = INPUT_HEADER.size
+        for _ in range(count):
+            seq, *quantized = INPUT_ITEM.unpack_from(data, offset)
+            offset += INPUT_ITEM.size
+            if seq > slot.last_seq:
+                slot.inputs.append((seq, input_from(quantized)))
+                slot.last_seq = seq
+        while len(slot.inputs) > MAX_QUEUED_INPUTS:
+            slot.inputs.popleft()
+
+    def _new_session(self):
+        # Новая сессия: заново все подключённые игроки и пустая история
+        # снимков (uid врагов начинаются с нуля, старые базы не годятся).
+        self.sessions += 1
+        seed = None if self.seed is None else self.seed + self.sessions
+        self.world.reset(seed=seed)
+        for slot in self.clients.values():
+            self.world.add_player(slot.player_id)
+        world = self.world
+        for i in range(self.crowd):
+            name = world.archetypes.names[i % len(world.archetypes.names)]
+            spawn_enemy(world.enemies, name, world.width, world.height, world.rng, world.archetypes)
+        self.history.clear()
+        for slot in self.clients.values():
+            slot.acked = None
+        self.restart_tick = None
+
+    def _tick(self, now):
+        if not self.clients:
+            return
+        self.tick += 1
+        world = self.world
+        if not world.alive:
+            if self.restart_tick is None:
+                self.restart_tick = self.tick + int(RESTART_SECONDS / self.dt)
+            elif self.tick >= self.restart_tick:
+                self._new_session()
+
+        alive = world.alive
+        started = time.perf_counter()
+        inputs = {}
+        for slot in self.clients.values():
+            if slot.inputs:
+                seq, slot.last_input = slot.inputs.popleft()
+                player = world.players.get(slot.player_id)
+                if player is not None:
+                    player.input_seq = seq
+            inputs[slot.player_id] = slot.last_input
+        world.step(inputs, self.dt)
+        # Пока все мертвы и ждут новой сессии, шаг пустой - в замеры не идёт.
+        if alive:
+            self.step_times.append(time.perf_counter() - started)
+
+        if self.tick % self.snapshot_every == 0:
+            self._send_snapshots()
+
+    def _send_snapshots(self):
+        started = time.perf_counter()
+        frame = capture(self.world, self.tick, self.sessions % 256)
+        self.history[frame.tick] = frame
+        self.history.pop(frame.tick - HISTORY * self.snapshot_every, None)
+        self.enemy_counts.append(len(frame.uid))
+        for address, slot in self.clients.items():
+            base = self.history.get(slot.acked)
+            player = self.world.players.get(slot.player_id)
+            data = encode_snapshot(frame, base, player.input_seq if player else 0)
+            if len(data) > MAX_DATAGRAM:
+                self.oversize += 1
+                continue
+            self.snapshot_sizes["delta" if base else "full"].append(len(data))
+            slot.sent_bytes += len(data)
+            self.socket.sendto(data, address)
+        self.encode_times.append(time.perf_counter() - started)
+
+    def report(self):
+        seconds = max((self.finished or time.perf_counter()) - (self.started or 0), 1e-9)
+
+        def ms(values):
+            if not values:
+                return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+            values = np.array(values) * 1000
+            return {"p50": round(float(np.median(values)), 3), "p95": round(float(np.percentile(values, 95)), 3),
+                    "max": round(float(values.max()), 3)}
+
+        def sizes(values):
+            return {"count": len(values), "mean": round(float(np.mean(values)), 1) if values else 0.0,
+                    "max": int(max(values)) if values else 0}
+
+        clients = len(self.clients) or 1
+        return {
+            "seconds": round(seconds, 1),
+            "ticks": self.tick,
+            "tick_rate": round(self.tick / seconds, 1),
+            "step_ms": ms(self.step_times),
+            "snapshot_ms": ms(self.encode_times),
+            "full_snapshots": sizes(self.snapshot_sizes["full"]),
+            "delta_snapshots": sizes(self.snapshot_sizes["delta"]),
+            "enemies": {"mean": round(float(np.mean(self.enemy_counts)), 1) if self.enemy_counts else 0.0,
+                        "max": int(max(self.enemy_counts, default=0))},
+            "down_kbps_per_client": round(self.socket.sent_bytes * 8 / 1000 / seconds / clients, 1),
+            "up_kbps_per_client": round(self.socket.received_bytes * 8 / 1000 / seconds / clients, 1),
+            "oversize": self.oversize,
+            "sessions": self.sessions,
+        }
+
+
+class Client:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, loss=0.0, seed=None):
+        self.server = (host, port)
+        self.socket = LossySocket(loss, seed)
+        self.player_id = None
+        self.width = 1280
+        self.height = 720
+        self.dt = SIM_DT
+        self.snapshot_every = 3
+        self.frames = {}
+        self.ticks = []
+        self.latest = None
+        self.render_tick = None
+        self.seq = 0
+        self.pending = deque()
+        self.predicted = None
+        self.session = None
+        # Счётчики для отчёта: исправления предсказания и нехватка снимков.
+        self.corrections = 0
+        self.correction_total = 0.0
+        self.underruns = 0
+        self.dropped = 0
+
+    def connect(self, timeout=5.0):
+        nonce = random.getrandbits(32)
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            self.socket.sendto(JOIN.pack(PROTOCOL, MSG_JOIN, nonce), self.server)
+            wait_until = time.perf_counter() + 0.25
+            while time.perf_counter() < wait_until:
+                for data, address in self.socket.receive():
+                    if len(data) < HEADER.size:
+                        continue
+                    protocol, kind = HEADER.unpack_from(data)
+                    if kind == MSG_FULL:
+                        raise ConnectionError("Сервер заполнен")
+                    if kind == MSG_WELCOME and len(data) >= WELCOME.size:
+                        (protocol, kind, reply_nonce, self.player_id, self.width, self.height,
+                         self.dt, self.snapshot_every) = WELCOME.unpack_from(data)
+                        if reply_nonce == nonce:
+                            return self.player_id
+                time.sleep(0.005)
+        raise ConnectionError(f"Сервер {self.server[0]}:{self.server[1]} не отвечает")
+
+    def close(self):
+        self.socket.sendto(HEADER.pack(PROTOCOL, MSG_LEAVE), self.server)
+        self.socket.close()
+
+    @property
+    def delay(self):
+        # Задержка показа - два интервала между снимками.
+        return 2 * self.snapshot_every
+
+    def send_input(self, inputs):
+        # Вызывается раз в шаг симуляции (self.dt).
+        self.seq += 1
+        quantized = quantize_input(inputs)
+        self.pending.append((self.seq, quantized))
+        while len(self.pending) > 120:
+            self.pending.popleft()
+        if self.predicted is not None and self.predicted.alive:
+            move_player(self.predicted, input_from(quantized), self.width, self.height, self.dt)
+        recent = list(self.pending)[-INPUT_REDUNDANCY:]
+        packet = [INPUT_HEADER.pack(PROTOCOL, MSG_INPUT, NO_BASE if self.latest is None else self.latest, len(recent))]
+        packet.extend(INPUT_ITEM.pack(seq, *item) for seq, item in recent)
+        self.socket.sendto(b"".join(packet), self.server)
+
+    def poll(self):
+        for data, address in self.socket.receive():
+            if len(data) < SNAPSHOT_HEADER.size or HEADER.unpack_from(data) != (PROTOCOL, MSG_SNAPSHOT):
+                continue
+            tick = struct.unpack_from("<I", data, HEADER.size)[0]
+            if tick in self.frames:
+                continue
+            try:
+                decoded = decode_snapshot(data, self.frames)
+            except (ValueError, zlib.error, struct.error):
+                decoded = None
+            if decoded is None:
+                self.dropped += 1
+                continue
+            frame, input_seq = decoded
+            self.frames[tick] = frame
+            self.ticks.insert(bisect_right(self.ticks, tick), tick)
+            while len(self.ticks) > HISTORY:
+                del self.frames[self.ticks.pop(0)]
+            if self.latest is None or tick > self.latest:
+                self.latest = tick
+                self._reconcile(frame, input_seq)
+
+    def _reconcile(self, frame, input_seq):
+        # Позиция сервера плюс входы, которые он ещё не применил.
+        own = next((player for player in frame.players if player[0] == self.player_id), None)
+        if own is None:
+            self.predicted = None
+            return
+        player_id, flags, x, y, angle, kills = own
+        previous = self.predicted
+        if previous is not None and frame.session != self.session:
+            # Новая сессия: игрок заново на месте появления, это не ошибка предсказания.
+            previous = None
+        self.session = frame.session
+        self.predicted = CoopPlayer(player_id, x, y)
+        self.predicted.alive = bool(flags & PLAYER_ALIVE)
+        while self.pending and self.pending[0][0] <= input_seq:
+            self.pending.popleft()
+        if self.predicted.alive:
+            for seq, quantized in self.pending:
+                move_player(self.predicted, input_from(quantized), self.width, self.height, self.dt)
+        if previous is not None:
+            # Для плавного показа сохраняем прошлую позицию.
+            self.predicted.prev_x = previous.x
+            self.predicted.prev_y = previous.y
+            # Смерть игрока - тоже расхождение, но предсказать её клиент не может.
+            error = math.hypot(self.predicted.x - previous.x, self.predicted.y - previous.y)
+            if self.predicted.alive and error > 0.5:
+                self.corrections += 1
+                self.correction_total += error
+
+    def view(self, dt):
+        # Что показывать сейчас: (Frame последнего снимка, игроки, враги x/y/тип).
+        # dt - сколько реального времени прошло с прошлого вызова.
+        if self.latest is None:
+            return None
+        target = self.latest - self.delay
+        if self.render_tick is None or abs(target - self.render_tick) > 4 * self.snapshot_every:
+            self.render_tick = float(target)
+        else:
+            self.render_tick += dt / self.dt
+            # Часы показа мягко подтягиваются к отставанию в self.delay шагов.
+            self.render_tick += (target - self.render_tick) * 0.05
+        index = bisect_right(self.ticks, self.render_tick)
+        if index >= len(self.ticks):
+            self.underruns += 1
+            a = b = self.frames[self.ticks[-1]]
+        elif index == 0:
+            a = b = self.frames[self.ticks[0]]
+        else:
+            a = self.frames[self.ticks[index - 1]]
+            b = self.frames[self.ticks[index]]
+        t = 0.0 if a is b else (self.render_tick - a.tick) / (b.tick - a.tick)
+
+        x = b.x.copy()
+        y = b.y.copy()
+        if a is not b and len(a.uid) and len(b.uid):
+            common, ia, ib = np.intersect1d(a.uid, b.uid, assume_unique=True, return_indices=True)
+            x[ib] = a.x[ia] + (b.x[ib] - a.x[ia]) * t
+            y[ib] = a.y[ia] + (b.y[ib] - a.y[ia]) * t
+
+        previous = {player[0]: player for player in a.players}
+        players = []
+        for player_id, flags, px, py, angle, kills in b.players:
+            if player_id == self.player_id and self.predicted is not None:
+                px, py = self.predicted.x, self.predicted.y
+            elif player_id in previous:
+                old = previous[player_id]
+                px = old[2] + (px - old[2]) * t
+                py = old[3] + (py - old[3]) * t
+            laser = None
+            if flags & PLAYER_SHOOTING and flags & PLAYER_ALIVE:
+                laser = self.laser_end(px, py, angle * 2 * math.pi / ANGLE_STEPS)
+            players.append((player_id, flags, px, py, kills, laser))
+        return self.frames[self.latest], players, x, y, b.type_id
+
+    def laser_end(self, x, y, angle):
+        cx = x + PLAYER_SIZE / 2
+        cy = y + PLAYER_SIZE / 2
+        end_x = cx + math.cos(angle) * 2000
+        end_y = cy + math.sin(angle) * 2000
+        clipped = clip_segment(cx, cy, end_x, end_y, -ARENA_MARGIN, -ARENA_MARGIN,
+                               self.width + ARENA_MARGIN, self.height + ARENA_MARGIN)
+        if clipped is not None:
+            end_x, end_y = clipped[2], clipped[3]
+        return (cx, cy), (end_x, end_y)
+
+
+def bot_inputs(client, x, y, enemy_x, enemy_y):
+    # Бот: стреляет в ближайшего врага и держится от него подальше.
+    if not len(enemy_x):
+        return Inputs()
+    cx = x + PLAYER_SIZE / 2
+    cy = y + PLAYER_SIZE / 2
+    ex = enemy_x + 35 / 2
+    ey = enemy_y + 35 / 2
+    target = int(np.argmin((ex - cx) ** 2 + (ey - cy) ** 2))
+    angle = math.atan2(ey[target] - cy, ex[target] - cx)
+    move_x = -math.cos(angle)
+    move_y = -math.sin(angle)
+    if not 100 < cx < client.width - 100:
+        move_x = 1.0 if cx < client.width / 2 else -1.0
+    if not 100 < cy < client.height - 100:
+        move_y = 1.0 if cy < client.height / 2 else -1.0
+    return Inputs(move_x, move_y, True, angle)
+
+
+def run_bot(client, stop_event, results):
+    started = time.perf_counter()
+    next_step = started
+    last_view = started
+    while not stop_event.is_set():
+        now = time.perf_counter()
+        if now < next_step:
+            time.sleep(min(next_step - now, 0.002))
+            continue
+        next_step += client.dt
+        client.poll()
+        view = client.view(now - last_view)
+        last_view = now
+        inputs = Inputs()
+        if view is not None and client.predicted is not None and client.predicted.alive:
+            frame, players, x, y, type_id = view
+            inputs = bot_inputs(client, client.predicted.x, client.predicted.y, x, y)
+        client.send_input(inputs)
+    client.close()
+    results[client.player_id] = {
+        "snapshots": len(client.ticks),
+        "corrections": client.corrections,
+        "mean_correction_px": round(client.correction_total / max(client.corrections, 1), 2),
+        "underruns": client.underruns,
+        "dropped": client.dropped,
+    }
+
+
+def run_loopback(players=3, seconds=30, crowd=0, loss=0.0, snapshot_every=3, seed=0):
+    server = Server("127.0.0.1", 0, seed=seed, snapshot_every=snapshot_every, crowd=crowd, loss=loss)
+    server_thread = threading.Thread(target=server.run, name="coop-server", daemon=True)
+    server_thread.start()
+    stop_event = threading.Event()
+    results = {}
+    threads = []
+    for i in range(players):
+        client = Client("127.0.0.1", server.address[1], loss=loss, seed=seed + i + 1)
+        client.connect()
+        thread = threading.Thread(target=run_bot, args=(client, stop_event, results), name=f"coop-bot-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    time.sleep(seconds)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    server.stop()
+    server_thread.join()
+    report = server.report()
+    report["clients"] = results
+    return report
+
+
+def format_report(report):
+    lines = [
+        f"Сервер: {report['ticks']} шагов за {report['seconds']} с ({report['tick_rate']} в секунду), "
+        f"сессий {report['sessions']}",
+        "Шаг мира, мс: p50 {p50}, p95 {p95}, макс {max}".format(**report["step_ms"]),
+        "Снимок для всех клиентов, мс: p50 {p50}, p95 {p95}, макс {max}".format(**report["snapshot_ms"]),
+        "Врагов в снимке: в среднем {mean}, максимум {max}".format(**report["enemies"]),
+        "Полные снимки: {count}, в среднем {mean} байт, максимум {max}".format(**report["full_snapshots"]),
+        "Дельта-снимки: {count}, в среднем {mean} байт, максимум {max}".format(**report["delta_snapshots"]),
+        f"Трафик на клиента: к клиенту {report['down_kbps_per_client']} кбит/с, "
+        f"от клиента {report['up_kbps_per_client']} кбит/с",
+    ]
+    if report["oversize"]:
+        lines.append(f"Не отправлено слишком больших снимков: {report['oversize']}")
+    for player_id, client in sorted(report.get("clients", {}).items()):
+        lines.append(f"Клиент {player_id}: исправлений предсказания {client['corrections']} "
+                     f"(в среднем {client['mean_correction_px']} px), нехватка снимков {client['underruns']}, "
+                     f"отброшено {client['dropped']}")
+    return lines
+
+
+def main(argv):
+    if not argv or argv[0] not in ("server", "loopback"):
+        print("Использование: python netcode.py server|loopback [параметры]")
+        return 2
+    command = argv[0]
+    options = {"--port": DEFAULT_PORT, "--players": 3, "--seconds": 30.0, "--crowd": 0,
+               "--loss": 0.0, "--snapshot-every": 3, "--host": "0.0.0.0"}
+    args = iter(argv[1:])
+    for arg in args:
+        if arg not in options:
+            print(f"Неизвестный аргумент: {arg}")
+            return 2
+        options[arg] = type(options[arg])(next(args))
+    if command == "loopback":
+        if not 1 <= options["--players"] <= MAX_PLAYERS:
+            print(f"Игроков может быть от 1 до {MAX_PLAYERS}")
+            return 2
+        report = run_loopback(options["--players"], options["--seconds"], options["--crowd"],
+                              options["--loss"], options["--snapshot-every"])
+        print("\n".join(format_report(report)))
+        return 0
+
+    server = Server(options["--host"], options["--port"], snapshot_every=options["--snapshot-every"],
+                    crowd=options["--crowd"], loss=options["--loss"])
+    print(f"Сервер слушает {server.address[0]}:{server.address[1]}, Ctrl+C - остановить")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        server.finished = time.perf_counter()
+    print("\n".join(format_report(server.report())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
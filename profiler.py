@@ -0,0 +1,106 @@
+import gc
+import time
+
+import numpy as np
+
+# Покадровый профилировщик: mark(фаза) добавляет время с предыдущей отметки
+# к фазе текущего кадра, end_frame() кладёт кадр в кольцевой буфер.
+# Выключенный профилировщик сразу выходит из mark(), а мир получает ссылку
+# на него только когда он включён.
+
+
+class FrameProfiler:
+    def __init__(self, size=600):
+        self.size = size
+        self.enabled = False
+        self.frames = 0
+        self.counters = {}
+        self._history = {}
+        self._frame = {}
+        self._index = 0
+        self._last = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.reset()
+        return self.enabled
+
+    def reset(self):
+        self.frames = 0
+        self._index = 0
+        self._history.clear()
+        self._frame.clear()
+        self._last = time.perf_counter_ns()
+
+    def begin_frame(self):
+        if self.enabled:
+            self._last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self._frame[phase] = self._frame.get(phase, 0) + now - self._last
+        self._last = now
+
+    def count(self, name, value):
+        # Произвольные счётчики кадра (число врагов, занятые голоса и т.п.).
+        if self.enabled:
+            self.counters[name] = value
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        for phase in self._frame:
+            if phase not in self._history:
+                self._history[phase] = np.zeros(self.size, dtype=np.int64)
+        for phase, history in self._history.items():
+            history[self._index] = self._frame.get(phase, 0)
+        self._frame.clear()
+        self._index = (self._index + 1) % self.size
+        self.frames = min(self.frames + 1, self.size)
+
+    def summary(self):
+        # {фаза: (среднее, p95, p99)} в миллисекундах по буферу кадров.
+        result = {}
+        if not self.frames:
+            return result
+        for phase, history in self._history.items():
+            samples = (history if self.frames == self.size else history[:self.frames]) / 1e6
+            p95, p99 = np.percentile(samples, (95, 99))
+            result[phase] = (float(samples.mean()), float(p95), float(p99))
+        return result
+
+    def overlay_lines(self):
+        lines = ["фаза          сред   p95   p99 мс"]
+        total = 0.0
+        for phase, (avg, p95, p99) in self.summary().items():
+            lines.append(f"{phase:<12}{avg:6.2f}{p95:6.2f}{p99:6.2f}")
+            total += avg
+        lines.append(f"{'кадр':<12}{total:6.2f}")
+        for name, value in self.counters.items():
+            lines.append(f"{name}: {value}")
+        collections = [stats["collections"] for stats in gc.get_stats()]
+        lines.append(f"gc: {gc.get_count()} сборок {collections}")
+        return lines
+
+
+class StartupTimer:
+    # Время запуска по этапам до первого кадра (--profile-startup).
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self._last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def report(self):
+        lines = [f"{phase:<16}{seconds * 1000:8.1f} мс" for phase, seconds in self.phases]
+        lines.append(f"{'итого':<16}{(self._last - self.started) * 1000:8.1f} мс")
+        return lines
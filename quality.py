@@ -0,0 +1,110 @@
+from collections import deque
+
+# Автоматическое качество графики. Губернатор смотрит на время работы кадра
+# (без ожидания в clock.tick) за последнюю секунду игры и, если кадр не
+# укладывается в бюджет 1/display_fps, отключает следующий пункт из
+# QUALITY_STEPS. Когда запас снова появился, пункты включаются обратно по
+# одному. От дребезга защищают разные пороги для спуска и подъёма, пауза
+# после каждой смены и удвоение паузы, если подъём сразу пришлось откатить.
+#
+# Уровень 0 - всё включено, уровень N - выключены первые N пунктов. Пункты
+# идут от самого дорогого в кадре игры к самому дешёвому. Пункты, которые
+# сейчас ничего не меняют (skip: например, сглаживание при масштабировании
+# силами SDL или джойстики при игре с клавиатуры), проходятся без остановки,
+# чтобы не ждать на них паузу. Свечение заголовка меню есть только на
+# уровне 0: меню в замеры не попадает.
+
+QUALITY_STEPS = (
+    ("smooth_scaling", "быстрое масштабирование"),
+    ("enemy_detail", "враги без сглаживания"),
+    ("hud", "редкий HUD"),
+    ("joystick_alpha", "простые джойстики"),
+    ("laser", "простой лазер"),
+)
+STEP_INDEX = {name: i for i, (name, label) in enumerate(QUALITY_STEPS)}
+MAX_TIER = len(QUALITY_STEPS)
+
+# Доли бюджета кадра: выше DOWNGRADE_LOAD - спуск, ниже UPGRADE_LOAD - подъём.
+DOWNGRADE_LOAD = 0.9
+UPGRADE_LOAD = 0.5
+
+
+class QualityGovernor:
+    # Время задаётся в кадрах: window - окно усреднения, hold - пауза после
+    # смены уровня, upgrade_wait - сколько кадров подряд нужен запас для подъёма.
+    def __init__(self, fps, tier=0, window=60, hold=60, upgrade_wait=180, max_upgrade_wait=1800):
+        self.budget = 1 / fps
+        self.tier = min(max(int(tier), 0), MAX_TIER)
+        self.hold = hold
+        self.upgrade_wait = upgrade_wait
+        self.max_upgrade_wait = max_upgrade_wait
+        self._times = deque(maxlen=window)
+        self._total = 0.0
+        self._hold = 0
+        self._headroom = 0
+        self._just_upgraded = False
+        self.skip = ()
+
+    def enabled(self, step):
+        return self.tier <= STEP_INDEX[step]
+
+    def label(self):
+        if self.tier == 0:
+            return "полное"
+        return f"{self.tier}/{MAX_TIER}, {QUALITY_STEPS[self.tier - 1][1]}"
+
+    def reset(self):
+        # Замеры вне игры (меню) в окно не попадают.
+        self._times.clear()
+        self._total = 0.0
+        self._headroom = 0
+
+    def sample(self, seconds):
+        # True, если уровень сменился.
+        if len(self._times) == self._times.maxlen:
+            self._total -= self._times[0]
+        self._times.append(seconds)
+        self._total += seconds
+        if self._hold > 0:
+            self._hold -= 1
+            return False
+        if len(self._times) < self._times.maxlen:
+            return False
+        load = self._total / len(self._times) / self.budget
+        lower = self._lower()
+        if load > DOWNGRADE_LOAD and lower is not None:
+            # Подъём не удержался - следующий попробуем вдвое позже.
+            if self._just_upgraded:
+                self.upgrade_wait = min(self.upgrade_wait * 2, self.max_upgrade_wait)
+            self._just_upgraded = False
+            self._change(lower)
+            return True
+        self._just_upgraded = False
+        if load < UPGRADE_LOAD and self.tier > 0:
+            self._headroom += 1
+            if self._headroom >= self.upgrade_wait:
+                self._just_upgraded = True
+                self._change(self._higher())
+                return True
+        else:
+            self._headroom = 0
+        return False
+
+    def _lower(self):
+        # Уровень, на котором выключен следующий действующий пункт, или None.
+        for tier in range(self.tier + 1, MAX_TIER + 1):
+            if QUALITY_STEPS[tier - 1][0] not in self.skip:
+                return tier
+        return None
+
+    def _higher(self):
+        # Уровень, на котором снова включён последний выключенный действующий пункт.
+        for tier in range(self.tier - 1, 0, -1):
+            if QUALITY_STEPS[tier][0] not in self.skip:
+                return tier
+        return 0
+
+    def _change(self, tier):
+        self.tier = tier
+        self._hold = self.hold
+        self.reset()
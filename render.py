@@ -0,0 +1,204 @@
+import pygame
+
+# Обновление экрана по "грязным" прямоугольникам: вместо заливки и вывода
+# всего экрана стираются и выводятся только области, где что-то изменилось.
+# Если таких областей слишком много, кадр выводится целиком через flip().
+
+
+class DirtyRects:
+    def __init__(self, size, enabled=True, threshold=0.4):
+        self.bounds = pygame.Rect((0, 0), size)
+        self.enabled = enabled
+        self.threshold = threshold
+        self.full_redraw = True
+        self._erase = []
+        self._moved_before = []
+        self._drawn = []
+        self._moved = []
+        self._present = []
+        self._slots = {}
+
+    def invalidate(self, size=None):
+        if size is not None:
+            self.bounds = pygame.Rect((0, 0), size)
+        self.full_redraw = True
+        self._slots.clear()
+
+    def begin(self, surface, color):
+        if not self.enabled or self.full_redraw:
+            surface.fill(color)
+        else:
+            for rect in self._erase:
+                surface.fill(color, rect)
+        self._drawn = []
+        self._moved = []
+        # Там, где в прошлом кадре были подвижные объекты, теперь пол.
+        self._present = list(self._moved_before)
+
+    def moving(self, rect):
+        # Объект, который перерисовывается и выводится каждый кадр.
+        rect = self.bounds.clip(rect)
+        if rect.width and rect.height:
+            self._drawn.append(rect)
+            self._moved.append(rect)
+            self._present.append(rect)
+
+    def moving_all(self, rects):
+        for rect in rects:
+            self.moving(rect)
+
+    def static(self, slot, content, rect):
+        # Объект, который выводится только при смене содержимого (надписи HUD).
+        # Стирается и рисуется он каждый кадр - иначе полупрозрачные края
+        # текста накапливались бы от повторного наложения.
+        rect = self.bounds.clip(rect)
+        self._drawn.append(rect)
+        previous = self._slots.get(slot)
+        if previous is None or previous[0] is not content or previous[1] != rect:
+            self._present.append(rect)
+            if previous is not None:
+                self._present.append(previous[1])
+            self._slots[slot] = (content, rect)
+
+    def present(self, target):
+        area = sum(rect.width * rect.height for rect in self._present)
+        if not self.enabled or self.full_redraw or area > self.threshold * self.bounds.width * self.bounds.height:
+            target.flip()
+        elif self._present:
+            target.update(self._present)
+        self._erase = self._drawn
+        self._moved_before = self._moved
+        self.full_redraw = False
+
+
+class RenderTarget:
+    # Куда рисует игра и как это попадает в окно.
+    # "native" - прямо в окно, разрешение игры равно разрешению окна;
+    # "scaled" - в поверхность постоянного размера, которая раз в кадр
+    #   масштабируется в окно с полосами по краям (smooth - сглаживание,
+    #   иначе целый множитель без сглаживания). Масштабирует процессор:
+    #   smoothscale до 4K стоит десятки миллисекунд на кадр;
+    # "gpu" - то же силами SDL: окно создаётся с флагом pygame.SCALED
+    #   (по умолчанию, кадр при этом выводится и грязными прямоугольниками).
+    # Если окно совпадает по размеру с поверхностью, масштабирования нет
+    # и игра рисует прямо в окно. fast - временно масштабировать без
+    # сглаживания (его включает губернатор качества, см. quality.py).
+    def __init__(self, size, mode="gpu", smooth=False):
+        self.size = size
+        self.mode = mode
+        self.smooth = smooth
+        self.fast = False
+        self.window = None
+        self.surface = None
+        self.viewport = None
+        self._dest = None
+
+    def window_flags(self):
+        return pygame.SCALED if self.mode == "gpu" else 0
+
+    @property
+    def scaling(self):
+        return self.surface is not self.window
+
+    @property
+    def smoothing(self):
+        # Кадр масштабируется процессором со сглаживанием (если не fast).
+        return self._dest is not None and self.smooth
+
+    def set_window(self, window):
+        self.window = window
+        window_w, window_h = window.get_size()
+        width, height = self.size
+        if self.mode != "scaled" or (window_w, window_h) == self.size:
+            self.surface = window
+            self.viewport = window.get_rect()
+            self._dest = None
+            return self.surface
+        scale = min(window_w / width, window_h / height)
+        if not self.smooth and scale >= 1:
+            scale = int(scale)
+        self.viewport = pygame.Rect(0, 0, int(width * scale), int(height * scale))
+        self.viewport.center = (window_w // 2, window_h // 2)
+        window.fill((0, 0, 0))
+        self._dest = window.subsurface(self.viewport)
+        self.surface = pygame.Surface(self.size).convert()
+        return self.surface
+
+    def flip(self):
+        if self._dest is not None:
+            if self.smooth and not self.fast:
+                pygame.transform.smoothscale(self.surface, self.viewport.size, self._dest)
+            else:
+                pygame.transform.scale(self.surface, self.viewport.size, self._dest)
+        pygame.display.flip()
+
+    def update(self, rects):
+        # При масштабировании кадр всё равно выводится целиком.
+        if self._dest is not None:
+            self.flip()
+        else:
+            pygame.display.update(rects)
+
+    def window_size(self):
+        return self.window.get_size()
+
+    def to_surface(self, pos):
+        # Координаты окна (мышь, касания) -> координаты поверхности игры.
+        if self._dest is None:
+            return pos
+        return ((pos[0] - self.viewport.x) * self.size[0] / self.viewport.width,
+                (pos[1] - self.viewport.y) * self.size[1] / self.viewport.height)
+
+
+class SpriteCache:
+    # Готовые поверхности в формате экрана (враги по типам, кольцо щита,
+    # основания джойстиков). Строятся один раз и пересобираются только
+    # после смены разрешения - invalidate() вызывается из toggle_fullscreen().
+    def __init__(self):
+        self._sprites = {}
+
+    def invalidate(self):
+        self._sprites.clear()
+
+    def get(self, key, build):
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = build()
+            self._sprites[key] = sprite
+        return sprite
+
+
+def solid_rect(color, size):
+    surface = pygame.Surface((size, size)).convert()
+    surface.fill(color)
+    return surface
+
+
+def rect_outline(color, size, width):
+    surface = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+    pygame.draw.rect(surface, color, (0, 0, size, size), width)
+    return surface
+
+
+def alpha_circle(color, radius):
+    surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA).convert_alpha()
+    pygame.draw.circle(surface, color, (radius, radius), radius)
+    return surface
+
+
+def build_enemy_sprites(archetypes):
+    # Спрайт на каждый type_id. Размер экземпляра может отличаться от таблицы
+    # только у врагов, появившихся до перезагрузки archetypes.json.
+    return [solid_rect(color, int(size)) for color, size in zip(archetypes.colors, archetypes.size)]
+
+
+def draw_enemies(surface, sprites, enemies, archetypes, alpha, doreturn=False):
+    # Весь слой врагов выводится одним вызовом blits() из готовых спрайтов.
+    # alpha=None - без интерполяции, враги рисуются там, где их оставил шаг.
+    if alpha is None:
+        enemy_x, enemy_y = enemies.x, enemies.y
+    else:
+        enemy_x, enemy_y = enemies.interpolated(alpha)
+    enemy_sprites = sprites.get("enemies", lambda: build_enemy_sprites(archetypes))
+    enemy_blits = list(zip(map(enemy_sprites.__getitem__, enemies.type_id.tolist()), zip(enemy_x.tolist(), enemy_y.tolist())))
+    return surface.blits(enemy_blits, doreturn=doreturn)
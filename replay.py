@@ -0,0 +1,128 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+from simulation import World, Inputs
+
+REPLAY_FILE = "last_replay.npz"
+
+# Запись сессии: seed мира и входы каждого шага симуляции (вектор движения,
+# флаг стрельбы, угол прицела; джойстики попадают сюда уже как вектор
+# движения и угол). Этого достаточно, чтобы повторить игру шаг в шаг.
+# Повтор идёт без окна с максимальной скоростью и сверяет итог (очки,
+# убийства, шаг смерти) с записанным - так проверяется, что оптимизация
+# не изменила игру.
+#
+#   python replay.py [файл]             повтор и сверка итога
+#   python replay.py [файл] --profile   то же с профилировщиком по фазам шага
+
+
+class InputRecorder:
+    def __init__(self):
+        self.start(0, 1280, 720, False, 1 / 60)
+
+    def start(self, seed, width, height, has_shield, dt):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.has_shield = has_shield
+        self.dt = dt
+        self.move_x = []
+        self.move_y = []
+        self.shooting = []
+        self.angle = []
+        # (шаг, ширина, высота) - смена разрешения посреди сессии.
+        self.resizes = []
+
+    def __len__(self):
+        return len(self.shooting)
+
+    def record(self, inputs):
+        self.move_x.append(inputs.move_x)
+        self.move_y.append(inputs.move_y)
+        self.shooting.append(inputs.shooting)
+        self.angle.append(math.nan if inputs.angle is None else inputs.angle)
+
+    def resize(self, width, height):
+        self.resizes.append((len(self), width, height))
+
+    def save(self, world, path=REPLAY_FILE):
+        np.savez_compressed(
+            path,
+            meta=np.array([self.seed, self.width, self.height, self.has_shield], dtype=np.int64),
+            dt=np.float64(self.dt),
+            move_x=np.array(self.move_x, dtype=np.float64),
+            move_y=np.array(self.move_y, dtype=np.float64),
+            shooting=np.array(self.shooting, dtype=bool),
+            angle=np.array(self.angle, dtype=np.float64),
+            resizes=np.array(self.resizes, dtype=np.int64).reshape(-1, 3),
+            outcome=np.array(outcome(world), dtype=np.int64),
+        )
+
+
+def outcome(world):
+    return (world.session_score, world.kills, world.money, world.tick, int(world.alive))
+
+
+def load_replay(path=REPLAY_FILE):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def play(replay, profiler=None):
+    seed, width, height, has_shield = (int(value) for value in replay["meta"])
+    dt = float(replay["dt"])
+    world = World(width, height, bool(has_shield), seed)
+    world.profiler = profiler
+    resizes = {int(tick): (int(w), int(h)) for tick, w, h in replay["resizes"]}
+    move_x = replay["move_x"].tolist()
+    move_y = replay["move_y"].tolist()
+    shooting = replay["shooting"].tolist()
+    angle = replay["angle"].tolist()
+    for tick in range(len(shooting)):
+        if tick in resizes:
+            world.resize(*resizes[tick])
+        if profiler is not None:
+            profiler.begin_frame()
+        world.step(Inputs(move_x[tick], move_y[tick], shooting[tick],
+                          None if math.isnan(angle[tick]) else angle[tick]), dt)
+        if profiler is not None:
+            profiler.end_frame()
+    return world
+
+
+def main(argv):
+    path = REPLAY_FILE
+    profile = False
+    for arg in argv:
+        if arg == "--profile":
+            profile = True
+        else:
+            path = arg
+    replay = load_replay(path)
+    profiler = None
+    if profile:
+        from profiler import FrameProfiler
+        profiler = FrameProfiler(size=max(1, len(replay["shooting"])))
+        profiler.toggle()
+    started = time.perf_counter()
+    world = play(replay, profiler)
+    wall = time.perf_counter() - started
+    expected = tuple(int(value) for value in replay["outcome"])
+    actual = outcome(world)
+    print(f"Шагов: {world.tick}, очки: {world.session_score}, убийства: {world.kills}, "
+          f"монеты: {world.money}, за {wall:.2f} с (x{world.time / max(wall, 1e-9):.0f})")
+    if profiler is not None:
+        for phase, (avg, p95, p99) in profiler.summary().items():
+            print(f"{phase:<12}{avg:8.3f}{p95:8.3f}{p99:8.3f} мс")
+    if actual != expected:
+        print(f"Итог расходится с записью: {actual} вместо {expected}")
+        return 1
+    print("Итог совпадает с записью")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+
+SAVE_FILE = "savedata.json"
+
+
+def load_save():
+    if os.path.exists(SAVE_FILE):
+        try:
+            with open(SAVE_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                if "total_kills" in data and "total_score" not in data:
+                    data["total_score"] = data["total_kills"]
+                    del data["total_kills"]
+                return {
+                    "total_score": data.get("total_score", 0),
+                    "total_playtime_seconds": data.get("total_playtime_seconds", 0),
+                    "total_deaths": data.get("total_deaths", 0),
+                    "sessions_played": data.get("sessions_played", 0),
+                    "best_session_score": data.get("best_session_score", 0),
+                    "music_volume": data.get("music_volume", 0.6),
+                    "shoot_volume": data.get("shoot_volume", 0.2),
+                    "death_volume": data.get("death_volume", 0.2),
+                    "upgrade_level": data.get("upgrade_level", 0),
+                    "total_money": data.get("total_money", 0),
+                    "shield_purchased": data.get("shield_purchased", False),
+                    "shield_active": data.get("shield_active", False),
+                    "control_mode": data.get("control_mode", "keyboard"),
+                    "sim_rate": data.get("sim_rate", 60),
+                    "display_fps": data.get("display_fps", 60),
+                    "dirty_rects": data.get("dirty_rects", False),
+                    "render_mode": data.get("render_mode", "gpu"),
+                    "smooth_scaling": data.get("smooth_scaling", False),
+                    "quality_tier": data.get("quality_tier", 0)
+                }
+        except (json.JSONDecodeError, ValueError):
+            print("Файл сохранения повреждён. Создаём новый.")
+    return {
+        "total_score": 0,
+        "total_playtime_seconds": 0,
+        "total_deaths": 0,
+        "sessions_played": 0,
+        "best_session_score": 0,
+        "music_volume": 0.6,
+        "shoot_volume": 0.2,
+        "death_volume": 0.2,
+        "upgrade_level": 0,
+        "total_money": 0,
+        "shield_purchased": False,
+        "shield_active": False,
+        "control_mode": "keyboard",
+        "sim_rate": 60,
+        "display_fps": 60,
+        "dirty_rects": False,
+        "render_mode": "gpu",
+        "smooth_scaling": False,
+        "quality_tier": 0
+    }
+
+
+def write_atomic(path, text):
+    # Пишем во временный файл и подменяем им сохранение: при падении
+    # на диске остаётся либо старый, либо новый файл целиком.
+    tmp_path = path + ".tmp"
+    if isinstance(text, bytes):
+        f = open(tmp_path, "wb")
+    else:
+        f = open(tmp_path, "w", encoding="utf-8")
+    with f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SaveWriter:
+    # Фоновое сохранение: save() только запоминает снимок статистики,
+    # запись на диск происходит в отдельном потоке не чаще раза в debounce
+    # секунд и пропускается, если содержимое файла не изменилось.
+    def __init__(self, path=SAVE_FILE, debounce=1.0):
+        self.path = path
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        self._pending = None
+        self._deadline = None
+        self._last_text = None
+        self._writing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, stats):
+        with self._cond:
+            self._pending = dict(stats)
+            if self._deadline is None:
+                self._deadline = time.monotonic() + self.debounce
+                self._cond.notify_all()
+
+    def flush(self):
+        # Записать отложенный снимок немедленно и дождаться окончания записи.
+        with self._cond:
+            if self._pending is not None:
+                self._deadline = time.monotonic()
+                self._cond.notify_all()
+            while self._pending is not None or self._writing:
+                self._cond.wait()
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _write(self, stats):
+        text = json.dumps(stats, indent=4, ensure_ascii=False)
+        if text == self._last_text:
+            return
+        try:
+            write_atomic(self.path, text)
+            self._last_text = text
+        except Exception as e:
+            print(f"Ошибка сохранения: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and (self._deadline is None or time.monotonic() < self._deadline):
+                    timeout = None if self._deadline is None else self._deadline - time.monotonic()
+                    self._cond.wait(timeout)
+                if self._pending is None:
+                    if self._closed:
+                        return
+                    self._deadline = None
+                    continue
+                stats = self._pending
+                self._pending = None
+                self._deadline = None
+                self._writing = True
+            try:
+                self._write(stats)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
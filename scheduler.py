@@ -0,0 +1,82 @@
+import heapq
+
+# Очередь отложенных событий на игровом времени (куча по времени
+# наступления). Вместо счётчиков, которые проверяются каждый шаг, событие
+# ставится один раз на нужный момент, а шаг спрашивает только pop_due():
+# пока ничего не наступило, это одно сравнение с вершиной кучи.
+#
+# Событие - имя и аргументы (простые данные), обработчики остаются у
+# владельца очереди. Поэтому snapshot() - обычный словарь, который можно
+# сохранить или передать, а restore() возвращает очередь в то же состояние.
+#
+# Своего темпа у очереди нет: advance(dt) сдвигает время ровно на dt, чтобы
+# таймеры шли вместе с движением в том же шаге. Пауза и ускорение - дело
+# того, кто вызывает шаги.
+
+# События, до которых осталось меньше EPSILON секунд, уже наступили:
+# сумма шагов по 1/60 не всегда ровно попадает в целые секунды.
+EPSILON = 1e-9
+
+
+class Scheduler:
+    def __init__(self, now=0.0):
+        self.now = now
+        self._heap = []
+        self._cancelled = set()
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._heap) - len(self._cancelled)
+
+    def at(self, when, name, *args):
+        # Возвращает номер события для cancel(). При равном времени события
+        # наступают в порядке постановки.
+        handle = self._seq
+        self._seq += 1
+        heapq.heappush(self._heap, (when, handle, name, args))
+        return handle
+
+    def after(self, delay, name, *args):
+        return self.at(self.now + delay, name, *args)
+
+    def cancel(self, handle):
+        if handle is not None and any(event[1] == handle for event in self._heap):
+            self._cancelled.add(handle)
+
+    def advance(self, dt):
+        self.now += dt
+
+    def next_time(self):
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self):
+        # События, наступившие к self.now, по порядку. Событие, поставленное
+        # обработчиком на уже прошедший момент, выдаётся в этом же проходе.
+        heap = self._heap
+        while heap and heap[0][0] <= self.now + EPSILON:
+            when, handle, name, args = heapq.heappop(heap)
+            if handle in self._cancelled:
+                self._cancelled.discard(handle)
+                continue
+            yield name, args
+
+    def _drop_cancelled(self):
+        heap = self._heap
+        while heap and heap[0][1] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(heap)[1])
+
+    def snapshot(self):
+        events = sorted(event for event in self._heap if event[1] not in self._cancelled)
+        return {
+            "now": self.now,
+            "seq": self._seq,
+            "events": [[when, handle, name, list(args)] for when, handle, name, args in events],
+        }
+
+    def restore(self, snapshot):
+        self.now = snapshot["now"]
+        self._seq = snapshot["seq"]
+        self._heap = [(when, handle, name, tuple(args)) for when, handle, name, args in snapshot["events"]]
+        heapq.heapify(self._heap)
+        self._cancelled = set()
@@ -0,0 +1,407 @@
+import math
+import random
+
+import numpy as np
+
+from archetypes import ARCHETYPES
+from enemy_store import EnemyStore
+from scheduler import Scheduler
+from steering import Steering
+from spatial import SpatialGrid, CELL_SIZE
+
+# Игровая логика без pygame: экран, шрифты и микшер здесь не используются,
+# поэтому мир можно гонять без окна в сотни раз быстрее реального времени.
+
+# Скорости - в пикселях в секунду, интервалы - в секундах, урон - в секунду.
+# Раньше всё считалось в кадрах при 60 FPS, отсюда множители 60.
+PLAYER_SIZE = 30
+PLAYER_SPEED = 6 * 60
+LASER_LENGTH = 2000
+LASER_DPS = 0.1 * 60
+# Враги появляются за краем арены, поэтому луч обрезается по арене с запасом.
+ARENA_MARGIN = 40
+SIM_DT = 1 / 60
+
+
+def spawn_enemy(store, enemy_type="basic", width=1280, height=720, rng=random, archetypes=ARCHETYPES):
+    side = rng.choice(['top', 'bottom', 'left', 'right'])
+    if side == 'top':
+        x = rng.randint(0, width)
+        y = -30
+    elif side == 'bottom':
+        x = rng.randint(0, width)
+        y = height
+    elif side == 'left':
+        x = -30
+        y = rng.randint(0, height)
+    else:
+        x = width
+        y = rng.randint(0, height)
+    type_id = archetypes.ids.get(enemy_type)
+    if type_id is None:
+        print(f"Неизвестный тип врага: {enemy_type}")
+        return store.add(0, 0, 0, 35, 1 * 60, 1, 0)
+    return store.add(type_id, x, y, archetypes.size[type_id], archetypes.speed[type_id],
+                     archetypes.hp[type_id], archetypes.score[type_id])
+
+
+def clip_segment(x0, y0, x1, y1, left, top, right, bottom):
+    # Отсечение отрезка прямоугольником (Лианг-Барски). None - отрезок снаружи.
+    dx = x1 - x0
+    dy = y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - left), (dx, right - x0), (-dy, y0 - top), (dy, bottom - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        r = q / p
+        if p < 0:
+            if r > t1:
+                return None
+            t0 = max(t0, r)
+        else:
+            if r < t0:
+                return None
+            t1 = min(t1, r)
+    return x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy
+
+
+# Параметры баланса (раздел "balance" в archetypes.json), их перебирает
+# batch.py. spawn_scale умножает интервал появления врагов уровня.
+DEFAULT_BALANCE = ARCHETYPES.balance
+
+
+class Inputs:
+    # move_x/move_y - множители скорости игрока (клавиатура: -1/0/1,
+    # джойстик: отклонение * 1.5), angle - угол лазера в радианах.
+    def __init__(self, move_x=0.0, move_y=0.0, shooting=False, angle=None):
+        self.move_x = move_x
+        self.move_y = move_y
+        self.shooting = shooting
+        self.angle = angle
+
+
+class World:
+    def __init__(self, width=1280, height=720, has_shield=False, seed=None, balance=None, archetypes=ARCHETYPES):
+        self.width = width
+        self.height = height
+        self.archetypes = archetypes
+        self.balance = dict(archetypes.balance, **(balance or {}))
+        # FrameProfiler, если включено профилирование (см. profiler.py).
+        self.profiler = None
+        self.reset(has_shield, seed)
+
+    def reset(self, has_shield=False, seed=None):
+        # Весь случай в сессии идёт из self.rng: одинаковые seed и входы
+        # дают одинаковую игру (см. replay.py).
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.player_size = PLAYER_SIZE
+        self.player_speed = PLAYER_SPEED
+        self.player_x = self.width // 2 - self.player_size // 2
+        self.player_y = self.height // 2 - self.player_size // 2
+        self.prev_player_x = self.player_x
+        self.prev_player_y = self.player_y
+        self.enemies = EnemyStore()
+        self._make_grid()
+        # Появление врагов и рост уровня - события в очереди на времени мира.
+        self.scheduler = Scheduler()
+        self.last_spawn_time = 0.0
+        self._spawn_event = None
+        self._upgrade_event = None
+        self.session_score = 0
+        self.player_damage = 1.0
+        self.money = 0
+        self.upgrade_level = 0
+        self.kills = 0
+        self.peak_enemies = 0
+        self.has_shield = has_shield
+        self.active_laser = None
+        self.laser_pierce = None
+        self.alive = True
+        self.killed_by = None
+        self.tick = 0
+        self.events = []
+        self._schedule_spawn()
+        self._schedule_upgrade()
+
+    def _make_grid(self):
+        self._make_spatial()
+        self.steering = Steering(self.width, self.height, margin=ARENA_MARGIN)
+
+    def _make_spatial(self):
+        # Клетка не меньше самого крупного врага (см. spatial.py), в том числе
+        # врагов, появившихся до перезагрузки archetypes.json.
+        cell_size = max(CELL_SIZE, float(self.archetypes.size.max()))
+        if self.enemies:
+            cell_size = max(cell_size, float(self.enemies.size.max()))
+        self.grid = SpatialGrid(self.width, self.height, cell_size, margin=ARENA_MARGIN)
+        self._grid_version = -1
+
+    def spatial(self):
+        # Сетка перестраивается лениво, не чаще одного раза на изменение врагов.
+        enemies = self.enemies
+        if self._grid_version != enemies.version:
+            cx, cy = enemies.centers()
+            self.grid.rebuild(cx, cy, enemies.size / 2)
+            self._grid_version = enemies.version
+        return self.grid
+
+    @property
+    def time(self):
+        return self.scheduler.now
+
+    @property
+    def elapsed_seconds(self):
+        return int(self.time + 1e-9)
+
+    def set_archetypes(self, archetypes):
+        # Новые таблицы после правки archetypes.json (см. archetypes.reload_if_changed).
+        # type_id врагов на арене - номер в старом списке типов, он переводится
+        # по имени; враги типов, которых больше нет, убираются с арены.
+        old_names = self.archetypes.names
+        if old_names != archetypes.names and self.enemies:
+            remap = np.array([archetypes.ids.get(name, -1) for name in old_names])
+            type_id = remap[self.enemies.type_id]
+            keep = type_id >= 0
+            self.enemies.type_id[:] = np.maximum(type_id, 0)
+            self.enemies.compact(keep)
+        self.archetypes = archetypes
+        self.balance = dict(archetypes.balance)
+        self._schedule_spawn()
+        self._schedule_upgrade()
+        self._make_spatial()
+
+    def resize(self, width, height):
+        rel_x = self.player_x / self.width
+        rel_y = self.player_y / self.height
+        self.width = width
+        self.height = height
+        self.player_x = int(rel_x * width)
+        self.player_y = int(rel_y * height)
+        self.player_x = max(0, min(width - self.player_size, self.player_x))
+        self.player_y = max(0, min(height - self.player_size, self.player_y))
+        self.prev_player_x = self.player_x
+        self.prev_player_y = self.player_y
+        self._make_grid()
+
+    def player_render_pos(self, alpha):
+        # Положение игрока между двумя последними шагами (0 - прошлый, 1 - текущий).
+        return (self.prev_player_x + (self.player_x - self.prev_player_x) * alpha,
+                self.prev_player_y + (self.player_y - self.prev_player_y) * alpha)
+
+    def step(self, inputs, dt):
+        # dt - длительность шага в секундах. События шага (выстрел,
+        # убийство, потеря щита, смерть) складываются в self.events,
+        # звук и сохранение остаются на стороне вызывающего кода.
+        self.events = []
+        if not self.alive:
+            return self.events
+        profiler = self.profiler
+        self.tick += 1
+        self.scheduler.advance(dt)
+
+        self.prev_player_x = self.player_x
+        self.prev_player_y = self.player_y
+        self.player_x += inputs.move_x * self.player_speed * dt
+        self.player_y += inputs.move_y * self.player_speed * dt
+        self.player_x = max(0, min(self.width - self.player_size, self.player_x))
+        self.player_y = max(0, min(self.height - self.player_size, self.player_y))
+
+        self.session_score = self.kills + self.elapsed_seconds // 2
+        if profiler is not None:
+            profiler.mark("игрок")
+
+        self.active_laser = None
+        if inputs.shooting and inputs.angle is not None:
+            self._fire(inputs.angle, dt)
+        if profiler is not None:
+            profiler.mark("лазер")
+
+        self._run_timers()
+        self.peak_enemies = max(self.peak_enemies, len(self.enemies))
+        if profiler is not None:
+            profiler.mark("спавн")
+
+        self._move_enemies(dt)
+        if profiler is not None:
+            profiler.mark("движение")
+        return self.events
+
+    def _run_timers(self):
+        for name, args in self.scheduler.pop_due():
+            if name == "spawn":
+                self._spawn()
+            elif name == "upgrade":
+                self._upgrade()
+
+    def _schedule_spawn(self):
+        # Интервал зависит от уровня, поэтому после смены уровня или таблиц
+        # следующее появление переносится: last_spawn_time + новый интервал.
+        # Интервал не короче шага симуляции: при нуле (spawn_scale=0 в batch.py)
+        # очередь иначе бесконечно выдавала бы появления в одном шаге.
+        self.scheduler.cancel(self._spawn_event)
+        interval = self.archetypes.spawn_interval(self.upgrade_level) * self.balance["spawn_scale"]
+        interval = max(interval, SIM_DT)
+        self._spawn_event = self.scheduler.at(self.last_spawn_time + interval, "spawn")
+
+    def _spawn(self):
+        archetypes = self.archetypes
+        type_id = archetypes.spawn_type(self.rng, self.upgrade_level)
+        spawn_enemy(self.enemies, archetypes.names[type_id], self.width, self.height, self.rng, archetypes)
+        self.last_spawn_time = self.time
+        self._spawn_event = None
+        self._schedule_spawn()
+
+    def _schedule_upgrade(self):
+        # Раз в upgrade_interval секунд уровень растёт на 1, урон - на damage_step.
+        self.scheduler.cancel(self._upgrade_event)
+        self._upgrade_event = None
+        balance = self.balance
+        if self.upgrade_level < balance["max_upgrade"]:
+            self._upgrade_event = self.scheduler.at((self.upgrade_level + 1) * balance["upgrade_interval"], "upgrade")
+
+    def _upgrade(self):
+        self.upgrade_level += 1
+        self.player_damage = round(1.0 + self.balance["damage_step"] * self.upgrade_level, 6)
+        self.events.append(("upgrade", self.upgrade_level))
+        self._upgrade_event = None
+        self._schedule_upgrade()
+        self._schedule_spawn()
+
+    def _fire(self, angle, dt):
+        px = self.player_x + self.player_size / 2
+        py = self.player_y + self.player_size / 2
+        self.active_laser = {'start': (px, py)}
+        self.events.append(("shoot",))
+        killed, score = self._laser(self.active_laser, angle, dt)
+        if killed:
+            self.money += score
+            self.kills += killed
+            self.events.append(("kill", killed, score))
+
+    def _laser(self, laser, angle, dt):
+        # Луч из laser['start'] под углом angle: дописывает laser['end'],
+        # наносит урон за dt и убирает убитых. Возвращает (убито, очки).
+        px, py = laser['start']
+        end_x = px + math.cos(angle) * LASER_LENGTH
+        end_y = py + math.sin(angle) * LASER_LENGTH
+        clipped = clip_segment(px, py, end_x, end_y,
+                               -ARENA_MARGIN, -ARENA_MARGIN,
+                               self.width + ARENA_MARGIN, self.height + ARENA_MARGIN)
+        if clipped is not None:
+            end_x, end_y = clipped[2], clipped[3]
+        laser['end'] = (end_x, end_y)
+
+        if self.enemies:
+            enemies = self.enemies
+            hit = self.spatial().query_segment(px, py, end_x, end_y)
+            if self.laser_pierce is not None and len(hit) > self.laser_pierce:
+                # Порядок вдоль луча нужен только при ограничении пробития.
+                dx = end_x - px
+                dy = end_y - py
+                cx, cy = enemies.centers()
+                t = (cx[hit] - px) * dx + (cy[hit] - py) * dy
+                hit = hit[np.argpartition(t, self.laser_pierce)[:self.laser_pierce]]
+            if not len(hit):
+                return 0, 0
+
+            hp = enemies.hp
+            hp[hit] -= self.player_damage * LASER_DPS * dt
+            dead = hit[hp[hit] <= 0]
+            if len(dead):
+                score = int(enemies.score_value[dead].sum())
+                keep = np.ones(len(enemies), dtype=bool)
+                keep[dead] = False
+                enemies.compact(keep)
+                return len(dead), score
+        return 0, 0
+
+    def steer_enemies(self, dt):
+        # Поле направлений к игроку плюс разведение толпы (steering.py).
+        enemies = self.enemies
+        px = self.player_x + self.player_size / 2
+        py = self.player_y + self.player_size / 2
+        cx, cy = enemies.centers()
+        dir_x, dir_y = self.steering.directions(cx, cy, px, py)
+        enemies.move(dir_x, dir_y, dt)
+
+    def _move_enemies(self, dt):
+        enemies = self.enemies
+        if not enemies:
+            return
+        self.steer_enemies(dt)
+        size = self.player_size
+        hits = np.sort(self.spatial().query_rect(self.player_x, self.player_y,
+                                                 self.player_x + size, self.player_y + size))
+        if not len(hits):
+            return
+        if self.has_shield:
+            self.has_shield = False
+            self.events.append(("shield_lost",))
+            enemies.remove(hits[0])
+            # remove() сдвигает врагов после hits[0] на одно место к началу.
+            hits = hits[1:] - 1
+        if len(hits):
+            self.alive = False
+            self.killed_by = self.archetypes.names[int(enemies.type_id[hits[0]])]
+            self.events.append(("death", self.session_score, self.elapsed_seconds))
+
+
+def nearest_enemy_policy(world):
+    # Простой бот: стоит на месте и стреляет в ближайшего врага.
+    if not world.enemies:
+        return Inputs()
+    px = world.player_x + world.player_size / 2
+    py = world.player_y + world.player_size / 2
+    cx, cy = world.enemies.centers()
+    target = int(np.argmin((cx - px) ** 2 + (cy - py) ** 2))
+    tx = cx[target]
+    ty = cy[target]
+    return Inputs(shooting=True, angle=math.atan2(float(ty) - py, float(tx) - px))
+
+
+def kite_policy(world):
+    # Бот посложнее: стреляет в ближайшего врага и отходит от него,
+    # а у стены смещается к центру арены.
+    inputs = nearest_enemy_policy(world)
+    if inputs.angle is None:
+        return inputs
+    move_x = -math.cos(inputs.angle)
+    move_y = -math.sin(inputs.angle)
+    px = world.player_x + world.player_size / 2
+    py = world.player_y + world.player_size / 2
+    if not 100 < px < world.width - 100:
+        move_x = 1.0 if px < world.width / 2 else -1.0
+    if not 100 < py < world.height - 100:
+        move_y = 1.0 if py < world.height / 2 else -1.0
+    inputs.move_x = move_x
+    inputs.move_y = move_y
+    return inputs
+
+
+POLICIES = {"nearest": nearest_enemy_policy, "kite": kite_policy}
+
+
+def run_headless(world, policy=nearest_enemy_policy, dt=SIM_DT, max_ticks=60 * 60 * 10):
+    while world.alive and world.tick < max_ticks:
+        world.step(policy(world), dt)
+    return world
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    max_seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    world = World(seed=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    started = time.perf_counter()
+    run_headless(world, max_ticks=max_seconds * 60)
+    wall = time.perf_counter() - started
+    print(f"Seed: {world.seed}")
+    print(f"Время: {world.elapsed_seconds} с, очки: {world.session_score}, "
+          f"убийства: {world.kills}, монеты: {world.money}, уровень: {world.upgrade_level}")
+    print(f"Скорость: x{world.time / max(wall, 1e-9):.0f} от реального времени")
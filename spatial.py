@@ -0,0 +1,138 @@
+import numpy as np
+
+# Равномерная сетка по арене. Враги раскладываются по клеткам своих центров
+# (сортировка подсчётом), запросы смотрят только на нужные клетки и их соседей.
+# Размер клетки должен быть не меньше самого крупного врага, тогда враг,
+# задевающий клетку, всегда лежит в ней или в соседней.
+
+CELL_SIZE = 64
+
+
+def segment_circle_mask(x0, y0, x1, y1, cx, cy, radius):
+    dx = x1 - x0
+    dy = y1 - y0
+    length2 = dx * dx + dy * dy
+    if length2 < 1e-12:
+        return np.zeros(len(cx), dtype=bool)
+    t = ((cx - x0) * dx + (cy - y0) * dy) / length2
+    ox = x0 + t * dx - cx
+    oy = y0 + t * dy - cy
+    return (t >= 0) & (t <= 1) & (ox * ox + oy * oy <= radius * radius)
+
+
+class SpatialGrid:
+    def __init__(self, width, height, cell_size=CELL_SIZE, margin=0):
+        self.cell_size = cell_size
+        self.left = -margin
+        self.top = -margin
+        self.right = width + margin
+        self.bottom = height + margin
+        self.cols = max(1, int(np.ceil((self.right - self.left) / cell_size)))
+        self.rows = max(1, int(np.ceil((self.bottom - self.top) / cell_size)))
+        self.cx = np.zeros(0)
+        self.cy = np.zeros(0)
+        self.radius = np.zeros(0)
+        self.order = np.zeros(0, dtype=np.intp)
+        self.cell_start = np.zeros(self.cols * self.rows + 1, dtype=np.intp)
+
+    def _col(self, x):
+        return min(self.cols - 1, max(0, int((x - self.left) // self.cell_size)))
+
+    def _row(self, y):
+        return min(self.rows - 1, max(0, int((y - self.top) // self.cell_size)))
+
+    def rebuild(self, cx, cy, radius):
+        self.cx = cx
+        self.cy = cy
+        self.radius = radius
+        # Враги за пределами сетки попадают в крайние клетки.
+        gx = np.clip(((cx - self.left) // self.cell_size).astype(np.intp), 0, self.cols - 1)
+        gy = np.clip(((cy - self.top) // self.cell_size).astype(np.intp), 0, self.rows - 1)
+        cells = gy * self.cols + gx
+        self.order = np.argsort(cells, kind="stable")
+        counts = np.bincount(cells, minlength=self.cols * self.rows)
+        self.cell_start[0] = 0
+        np.cumsum(counts, out=self.cell_start[1:])
+
+    def _gather(self, cell_mask):
+        cells = np.flatnonzero(cell_mask)
+        starts = self.cell_start[cells]
+        lengths = self.cell_start[cells + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(0, dtype=np.intp)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.order[offsets + np.arange(total)]
+
+    def _rect_cells(self, left, top, right, bottom):
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        c0 = max(0, self._col(left) - 1)
+        c1 = self._col(right) + 1
+        r0 = max(0, self._row(top) - 1)
+        r1 = self._row(bottom) + 1
+        mask[r0:r1 + 1, c0:c1 + 1] = True
+        return mask
+
+    def query_rect(self, left, top, right, bottom):
+        # Враги, чей квадрат пересекает прямоугольник (та же проверка, что AABB игрока).
+        idx = self._gather(self._rect_cells(left, top, right, bottom))
+        cx = self.cx[idx]
+        cy = self.cy[idx]
+        r = self.radius[idx]
+        inside = (left < cx + r) & (right > cx - r) & (top < cy + r) & (bottom > cy - r)
+        return idx[inside]
+
+    def query_radius(self, x, y, radius):
+        # Враги, чей круг пересекается с кругом (x, y, radius).
+        idx = self._gather(self._rect_cells(x - radius, y - radius, x + radius, y + radius))
+        dx = self.cx[idx] - x
+        dy = self.cy[idx] - y
+        reach = self.radius[idx] + radius
+        return idx[dx * dx + dy * dy <= reach * reach]
+
+    def segment_cells(self, x0, y0, x1, y1):
+        # Обход клеток вдоль отрезка (DDA, Amanatides-Woo), останавливается на краю сетки.
+        cells = []
+        col = self._col(x0)
+        row = self._row(y0)
+        end_col = self._col(x1)
+        end_row = self._row(y1)
+        dx = x1 - x0
+        dy = y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        size = self.cell_size
+        if dx != 0:
+            next_x = self.left + (col + (1 if dx > 0 else 0)) * size
+            t_max_x = (next_x - x0) / dx
+            t_delta_x = size / abs(dx)
+        else:
+            t_max_x = t_delta_x = float("inf")
+        if dy != 0:
+            next_y = self.top + (row + (1 if dy > 0 else 0)) * size
+            t_max_y = (next_y - y0) / dy
+            t_delta_y = size / abs(dy)
+        else:
+            t_max_y = t_delta_y = float("inf")
+        while True:
+            cells.append((row, col))
+            if (col == end_col and row == end_row) or min(t_max_x, t_max_y) > 1:
+                break
+            if t_max_x < t_max_y:
+                col += step_x
+                t_max_x += t_delta_x
+            else:
+                row += step_y
+                t_max_y += t_delta_y
+            if not (0 <= col < self.cols and 0 <= row < self.rows):
+                break
+        return cells
+
+    def query_segment(self, x0, y0, x1, y1):
+        # Враги, чей круг пересекает отрезок.
+        mask = np.zeros((self.rows + 2, self.cols + 2), dtype=bool)
+        for row, col in self.segment_cells(x0, y0, x1, y1):
+            mask[row:row + 3, col:col + 3] = True
+        idx = self._gather(mask[1:-1, 1:-1])
+        hit = segment_circle_mask(x0, y0, x1, y1, self.cx[idx], self.cy[idx], self.radius[idx])
+        return idx[hit]
@@ -0,0 +1,228 @@
+import numpy as np
+
+# Рулёжка врагов целиком на массивах, без цикла по врагам.
+#
+# Поле направлений (FlowField) считается раз в шаг по крупной сетке арены:
+# в каждой клетке - единичный вектор к игроку. Враг берёт направление
+# билинейно из четырёх ближайших клеток, а вблизи игрока идёт к нему
+# напрямую. Пока на арене нет препятствий, поле - просто направление
+# от центра клетки к игроку; с препятствиями (blocked) оно строится по
+# расстояниям в обход них и пересчитывается, только когда игрок сменил
+# клетку. Для врагов цена одна и та же: выборка из поля. Целей может быть
+# несколько (игроки в coop.py) - тогда поле ведёт к ближайшей.
+#
+# Разведение (separation) не ищет пары соседей: враги раскладываются по
+# мелкой сетке (bincount), и каждого отталкивает от центра масс его
+# клетки и от более плотных соседних клеток. Толчок умножается на
+# собственную скорость врага, поэтому быстрые (runner) обходят толпу
+# медленных, а не толкают её.
+
+FLOW_CELL = 64
+# Ближе этого враг идёт к игроку напрямую, мимо поля.
+DIRECT_DISTANCE = FLOW_CELL * 1.5
+SEPARATION_CELL = 40
+SEPARATION_WEIGHT = 0.6
+
+# Соседи клетки: (строка, столбец, длина шага).
+NEIGHBORS = tuple((dr, dc, float(np.hypot(dr, dc)))
+                  for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc)
+
+
+class FlowField:
+    def __init__(self, width, height, cell_size=FLOW_CELL, margin=0):
+        self.cell_size = cell_size
+        self.left = -margin
+        self.top = -margin
+        self.cols = max(1, int(np.ceil((width + 2 * margin) / cell_size)))
+        self.rows = max(1, int(np.ceil((height + 2 * margin) / cell_size)))
+        self.center_x = self.left + (np.arange(self.cols) + 0.5) * cell_size
+        self.center_y = self.top + (np.arange(self.rows) + 0.5) * cell_size
+        self.blocked = np.zeros((self.rows, self.cols), dtype=bool)
+        self.dir_x = np.zeros((self.rows, self.cols))
+        self.dir_y = np.zeros((self.rows, self.cols))
+        self._flat = self._padded()
+        self._goal = None
+
+    def set_blocked(self, blocked):
+        self.blocked = np.asarray(blocked, dtype=bool).reshape(self.rows, self.cols)
+        self._goal = None
+
+    def _cell(self, x, y):
+        col = min(self.cols - 1, max(0, int((x - self.left) // self.cell_size)))
+        row = min(self.rows - 1, max(0, int((y - self.top) // self.cell_size)))
+        return row, col
+
+    def update(self, px, py):
+        # px, py - координаты цели или массивы координат нескольких целей.
+        goals_x = np.atleast_1d(px)
+        goals_y = np.atleast_1d(py)
+        if not self.blocked.any():
+            dx = goals_x[:, np.newaxis, np.newaxis] - self.center_x[np.newaxis, np.newaxis, :]
+            dy = goals_y[:, np.newaxis, np.newaxis] - self.center_y[np.newaxis, :, np.newaxis]
+            dx, dy = np.broadcast_arrays(dx, dy)
+            dist = np.hypot(dx, dy)
+            if len(goals_x) > 1:
+                nearest = np.argmin(dist, axis=0)[np.newaxis]
+                dx = np.take_along_axis(dx, nearest, axis=0)
+                dy = np.take_along_axis(dy, nearest, axis=0)
+                dist = np.take_along_axis(dist, nearest, axis=0)
+            dist = np.maximum(dist[0], 1e-6)
+            self.dir_x = dx[0] / dist
+            self.dir_y = dy[0] / dist
+            self._flat = self._padded()
+            self._goal = None
+            return
+        goal = tuple(sorted(set(self._cell(x, y) for x, y in zip(goals_x.tolist(), goals_y.tolist()))))
+        if goal != self._goal:
+            self._goal = goal
+            self._build(self._integrate(goal))
+
+    def _integrate(self, goal):
+        # Расстояние до ближайшей клетки-цели в обход препятствий: волна по
+        # 8 соседям, пока хоть одна клетка улучшается (не больше rows + cols проходов).
+        rows, cols = self.rows, self.cols
+        dist = np.full((rows, cols), np.inf)
+        for cell in goal:
+            dist[cell] = 0.0
+        padded = np.full((rows + 2, cols + 2), np.inf)
+        for _ in range(rows + cols):
+            padded[1:-1, 1:-1] = dist
+            best = dist.copy()
+            for dr, dc, cost in NEIGHBORS:
+                np.minimum(best, padded[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols] + cost, out=best)
+            best[self.blocked] = np.inf
+            if np.array_equal(best, dist):
+                break
+            dist = best
+        return dist
+
+    def _build(self, dist):
+        # В каждой клетке - шаг к соседу с наименьшим расстоянием.
+        rows, cols = self.rows, self.cols
+        padded = np.full((rows + 2, cols + 2), np.inf)
+        padded[1:-1, 1:-1] = dist
+        candidates = np.stack([padded[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols] for dr, dc, cost in NEIGHBORS])
+        best = np.argmin(candidates, axis=0)
+        step_y = np.array([dr / cost for dr, dc, cost in NEIGHBORS])[best]
+        step_x = np.array([dc / cost for dr, dc, cost in NEIGHBORS])[best]
+        # Клетки целей и клетки, откуда до них не дойти, направления не дают.
+        stuck = ~np.isfinite(dist) | (dist == 0)
+        step_x[stuck] = 0.0
+        step_y[stuck] = 0.0
+        self.dir_x = step_x
+        self.dir_y = step_y
+        self._flat = self._padded()
+
+    def _padded(self):
+        flat = []
+        for field in (self.dir_x, self.dir_y):
+            padded = np.empty((self.rows + 1, self.cols + 1))
+            padded[:-1, :-1] = field
+            padded[-1, :-1] = field[-1]
+            padded[:, -1] = padded[:, -2]
+            flat.append(padded.ravel())
+        return flat
+
+    def sample(self, x, y):
+        # Билинейная выборка направления в точках (x, y). Поле дополнено
+        # копией последних строки и столбца (_flat), чтобы у каждой точки
+        # были все четыре соседа и индексы считались без проверок.
+        cols = self.cols + 1
+        fx = np.clip((x - self.left) / self.cell_size - 0.5, 0, self.cols - 1)
+        fy = np.clip((y - self.top) / self.cell_size - 0.5, 0, self.rows - 1)
+        c0 = fx.astype(np.intp)
+        r0 = fy.astype(np.intp)
+        tx = fx - c0
+        ty = fy - r0
+        i00 = r0 * cols + c0
+        i10 = i00 + cols
+        result = []
+        for flat in self._flat:
+            top = flat[i00]
+            top += (flat[i00 + 1] - top) * tx
+            bottom = flat[i10]
+            bottom += (flat[i10 + 1] - bottom) * tx
+            top += (bottom - top) * ty
+            result.append(top)
+        return result
+
+
+def separation(cx, cy, left, top, right, bottom, cell_size=SEPARATION_CELL):
+    # Вектор разведения для каждого врага, длина не больше 1.
+    cols = max(1, int(np.ceil((right - left) / cell_size)))
+    rows = max(1, int(np.ceil((bottom - top) / cell_size)))
+    gx = np.clip(((cx - left) // cell_size).astype(np.intp), 0, cols - 1)
+    gy = np.clip(((cy - top) // cell_size).astype(np.intp), 0, rows - 1)
+    cells = gy * cols + gx
+    count = np.bincount(cells, minlength=rows * cols)
+    inverse = 1 / np.maximum(count, 1)
+    # Внутри клетки - от центра масс её врагов, тем сильнее, чем их больше.
+    sx = cx - (np.bincount(cells, cx, rows * cols) * inverse)[cells]
+    sy = cy - (np.bincount(cells, cy, rows * cols) * inverse)[cells]
+    length = np.hypot(sx, sy)
+    np.maximum(length, 1e-9, out=length)
+    inner = (1 - inverse)[cells] / length
+    sx *= inner
+    sy *= inner
+    # Между клетками - от более плотной соседней клетки к менее плотной.
+    density = np.empty((rows + 2, cols + 2))
+    density[1:-1, 1:-1] = count.reshape(rows, cols)
+    density[0] = density[1]
+    density[-1] = density[-2]
+    density[:, 0] = density[:, 1]
+    density[:, -1] = density[:, -2]
+    sx += ((density[1:-1, :-2] - density[1:-1, 2:]) / 2).ravel()[cells]
+    sy += ((density[:-2, 1:-1] - density[2:, 1:-1]) / 2).ravel()[cells]
+    length = np.hypot(sx, sy)
+    np.maximum(length, 1, out=length)
+    sx /= length
+    sy /= length
+    return sx, sy
+
+
+class Steering:
+    def __init__(self, width, height, margin=0):
+        self.left = -margin
+        self.top = -margin
+        self.right = width + margin
+        self.bottom = height + margin
+        self.field = FlowField(width, height, margin=margin)
+
+    def directions(self, cx, cy, px, py):
+        # Желаемое направление каждого врага (длина не больше 1).
+        # px, py - игрок или массивы координат нескольких игроков.
+        field = self.field
+        field.update(px, py)
+        ux, uy = field.sample(cx, cy)
+        # Среднее соседних направлений короче единицы - враг бы замедлялся.
+        length = np.hypot(ux, uy)
+        np.maximum(length, 1e-9, out=length)
+        ux /= length
+        uy /= length
+        if np.ndim(px):
+            # Прямой путь - к ближайшему игроку.
+            dx = np.asarray(px)[:, np.newaxis] - cx
+            dy = np.asarray(py)[:, np.newaxis] - cy
+            dist = np.hypot(dx, dy)
+            nearest = np.argmin(dist, axis=0)[np.newaxis]
+            dx = np.take_along_axis(dx, nearest, axis=0)[0]
+            dy = np.take_along_axis(dy, nearest, axis=0)[0]
+            dist = np.take_along_axis(dist, nearest, axis=0)[0]
+        else:
+            dx = px - cx
+            dy = py - cy
+            dist = np.hypot(dx, dy)
+        near = dist < DIRECT_DISTANCE
+        if near.any():
+            d = np.maximum(dist[near], 0.1)
+            ux[near] = dx[near] / d
+            uy[near] = dy[near] / d
+        if len(cx) > 1:
+            sx, sy = separation(cx, cy, self.left, self.top, self.right, self.bottom)
+            ux += sx * SEPARATION_WEIGHT
+            uy += sy * SEPARATION_WEIGHT
+        length = np.hypot(ux, uy)
+        np.maximum(length, 1, out=length)
+        ux /= length
+        uy /= length
+        return ux, uy
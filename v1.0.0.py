@@ -1,89 +1,47 @@
+import time
+startup_started = time.perf_counter()
 import pygame
 import sys
-import random
 import math
-import json
-import os
-
-SAVE_FILE = "savedata.json"
-
-def load_save():
-    if os.path.exists(SAVE_FILE):
-        try:
-            with open(SAVE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if "total_kills" in data and "total_score" not in data:
-                    data["total_score"] = data["total_kills"]
-                    del data["total_kills"]
-                return {
-                    "total_score": data.get("total_score", 0),
-                    "total_playtime_seconds": data.get("total_playtime_seconds", 0),
-                    "total_deaths": data.get("total_deaths", 0),
-                    "sessions_played": data.get("sessions_played", 0),
-                    "best_session_score": data.get("best_session_score", 0),
-                    "music_volume": data.get("music_volume", 0.6),
-                    "shoot_volume": data.get("shoot_volume", 0.2),
-                    "death_volume": data.get("death_volume", 0.2),
-                    "upgrade_level": data.get("upgrade_level", 0),
-                    "total_money": data.get("total_money", 0),
-                    "shield_purchased": data.get("shield_purchased", False),
-                    "shield_active": data.get("shield_active", False),
-                    "control_mode": data.get("control_mode", "keyboard")
-                }
-        except (json.JSONDecodeError, ValueError):
-            print("Файл сохранения повреждён. Создаём новый.")
-    return {
-        "total_score": 0,
-        "total_playtime_seconds": 0,
-        "total_deaths": 0,
-        "sessions_played": 0,
-        "best_session_score": 0,
-        "music_volume": 0.6,
-        "shoot_volume": 0.2,
-        "death_volume": 0.2,
-        "upgrade_level": 0,
-        "total_money": 0,
-        "shield_purchased": False,
-        "shield_active": False,
-        "control_mode": "keyboard"
-    }
-
-def save_stats(stats):
-    try:
-        with open(SAVE_FILE, "w", encoding="utf-8") as f:
-            json.dump(stats, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        print(f"Ошибка сохранения: {e}")
-
-pygame.init()
+from audio import Audio
+from savegame import load_save, SaveWriter
+from history import SessionHistory
+from textcache import TextCache, format_time
+from profiler import FrameProfiler, StartupTimer
+from render import DirtyRects, RenderTarget, SpriteCache, rect_outline, alpha_circle, draw_enemies
+from archetypes import reload_if_changed
+from controls import InputLayer
+from simulation import World, PLAYER_SIZE
+from replay import InputRecorder
+from quality import QualityGovernor
+
+# До первого кадра поднимаются только окно и шрифты главного меню.
+# Остальные модули pygame (микшер, джойстики) и звук - в finish_startup().
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+startup = StartupTimer(startup_started)
+startup.mark("импорт")
+
+pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
+pygame.display.init()
+pygame.font.init()
 WIDTH, HEIGHT = 1280, 720
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Cyber - Arena")
+startup.mark("окно")
 
-font = pygame.font.SysFont(None, 36)
-big_font = pygame.font.SysFont(None, 64)
-game_over_font = pygame.font.SysFont(None, 48)
-small_font = pygame.font.SysFont(None, 24)
-
-pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
-pygame.mixer.set_num_channels(32)
-
-try:
-    death_sound = pygame.mixer.Sound("death_sound.mp3")
-    shoot_sound = pygame.mixer.Sound("shoot_sound.mp3")
-    death_sound.set_volume(0.2)
-    shoot_sound.set_volume(0.2)
-except pygame.error as e:
-    print(f"Не удалось загрузить звук: {e}")
-    death_sound = None
-    shoot_sound = None
-
-try:
-    pygame.mixer.music.load("music.wav")
-    pygame.mixer.music.set_volume(0.6)
-    pygame.mixer.music.play(-1)
-except pygame.error as e:
-    print(f"Не удалось загрузить музыку: {e}")
+fonts = {}
+
+def get_font(size):
+    # Шрифт создаётся при первом использовании этого размера.
+    cached = fonts.get(size)
+    if cached is None:
+        cached = fonts[size] = pygame.font.SysFont(None, size)
+    return cached
+
+font = get_font(36)
+big_font = get_font(64)
+text_cache = TextCache()
+startup.mark("шрифты")
 
 BACKGROUND = (20, 20, 35)
 PLAYER_COLOR = (100, 200, 255)
@@ -172,815 +130,678 @@ class VirtualJoystick:
         self.normalized_dy = 0
         
     def draw(self, screen):
-        s = pygame.Surface((self.radius * 2, self.radius * 2), pygame.SRCALPHA)
-        pygame.draw.circle(s, (*JOYSTICK_BG[:3], 100), (self.radius, self.radius), self.radius)
-        screen.blit(s, (self.base_x - self.radius, self.base_y - self.radius))
+        if quality.enabled("joystick_alpha"):
+            base = sprites.get(("joystick_base", self.radius), lambda: alpha_circle((*JOYSTICK_BG[:3], 100), self.radius))
+            screen.blit(base, (self.base_x - self.radius, self.base_y - self.radius))
+        else:
+            pygame.draw.circle(screen, JOYSTICK_BG[:3], (self.base_x, self.base_y), self.radius, 2)
         
         if self.active:
             pygame.draw.circle(screen, JOYSTICK_HANDLE, (int(self.x), int(self.y)), self.handle_radius)
-            pygame.draw.circle(screen, (255, 255, 255), (int(self.x), int(self.y)), self.handle_radius, 2)
+            handle = pygame.draw.circle(screen, (255, 255, 255), (int(self.x), int(self.y)), self.handle_radius, 2)
         else:
-            pygame.draw.circle(screen, (*JOYSTICK_HANDLE, 100), (int(self.x), int(self.y)), self.handle_radius, 2)
-
-def get_enemy_color(enemy):
-    if enemy['type'] == 'basic':
-        return (255, 80, 80)
-    elif enemy['type'] == 'armored':
-        return (100, 100, 200)
-    elif enemy['type'] == 'runner':
-        return (255, 255, 255)
-    elif enemy['type'] == 'basic+':
-        return (255, 120, 80)
-    elif enemy['type'] == 'armored+':
-        return (120, 120, 220)
-    elif enemy['type'] == 'runner+':
-        return (255, 255, 180)
-    return (200, 200, 200)
-
-player_size = 30
-player_speed = 6
-player_x = 0
-player_y = 0
-enemies = []
-spawn_timer = 0
-session_score = 0
-start_time = 0
+            handle = pygame.draw.circle(screen, (*JOYSTICK_HANDLE, 100), (int(self.x), int(self.y)), self.handle_radius, 2)
+        return self.rect.union(handle)
+
+sprites = SpriteCache()
+
+def build_shield_sprite():
+    return rect_outline(SHIELD_COLOR, PLAYER_SIZE + 10, 3)
+
 fullscreen = False
 music_volume = 0.6
 shoot_volume = 0.2
 death_volume = 0.2
 state = "main_menu"
-money = 0
-player_damage = 1.0
-upgrade_level = 0
-kills = 0
-has_shield = False
 
 global_stats = load_save()
+saver = SaveWriter()
+history = SessionHistory()
+history.seed_totals(global_stats)
+global_stats.update(history.totals())
 music_volume = global_stats["music_volume"]
 shoot_volume = global_stats["shoot_volume"]
 death_volume = global_stats["death_volume"]
-has_shield = global_stats["shield_active"]
 control_mode = global_stats.get("control_mode", "keyboard")
+# Частота симуляции и частота кадров настраиваются независимо (60/120/144 Гц).
+sim_dt = 1 / global_stats["sim_rate"]
+display_fps = global_stats["display_fps"]
+# Если кадр не укладывается в бюджет, губернатор по шагам упрощает графику.
+quality = QualityGovernor(display_fps, global_stats["quality_tier"])
+# На упрощённом HUD надписи обновляются раз в столько кадров.
+LOW_HUD_INTERVAL = 10
+# Больше этого за кадр не догоняем, иначе медленная машина уйдёт в спираль.
+MAX_FRAME_TIME = 0.25
+sim_accumulator = 0.0
+# Необязательный режим вывода только изменившихся областей (для слабых машин).
+dirty = DirtyRects((WIDTH, HEIGHT), enabled=global_stats["dirty_rects"])
+
+audio = Audio(music_volume, shoot_volume, death_volume)
+startup.mark("сохранение")
+
+# Игра рисует в поверхность 1280x720, а в окно другого размера она
+# масштабируется (render_mode "scaled"/"gpu"); "native" - рисовать
+# в полном разрешении окна, как раньше.
+target = RenderTarget((WIDTH, HEIGHT), global_stats["render_mode"], global_stats["smooth_scaling"])
+if target.window_flags():
+    try:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT), target.window_flags())
+    except pygame.error as e:
+        # Без рендерера SDL (pygame.SCALED) масштабируем сами, целым множителем.
+        print(f"Масштабирование SDL недоступно ({e}), кадр масштабируется программно")
+        target.mode = "scaled"
+screen = target.set_window(screen)
+target.fast = not quality.enabled("smooth_scaling")
+
+world = World(WIDTH, HEIGHT)
+# Входы каждого шага пишутся для повтора сессии (python replay.py).
+recorder = InputRecorder()
 
-if shoot_sound:
-    shoot_sound.set_volume(shoot_volume)
-if death_sound:
-    death_sound.set_volume(death_volume)
-pygame.mixer.music.set_volume(music_volume)
-
-if fullscreen:
-    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.FULLSCREEN)
-    
 def reset_game():
-    global player_x, player_y, enemies, spawn_timer, money, upgrade_level, session_score, player_damage, start_time, kills, has_shield
-    player_x = WIDTH // 2 - player_size // 2
-    player_y = HEIGHT // 2 - player_size // 2
-    enemies = []
-    spawn_timer = 0
-    session_score = 0
-    start_time = pygame.time.get_ticks()
-    player_damage = 1.0
-    money = 0
-    upgrade_level = 0
-    kills = 0
-    has_shield = global_stats.get("shield_active", False)
+    global sim_accumulator, hud
+    sim_accumulator = 0.0
+    hud = None
+    dirty.invalidate()
+    world.width = WIDTH
+    world.height = HEIGHT
+    world.reset(global_stats.get("shield_active", False))
+    recorder.start(world.seed, WIDTH, HEIGHT, world.has_shield, sim_dt)
 
 reset_game()
 
-def spawn_enemy(enemy_type="basic"):
-    side = random.choice(['top', 'bottom', 'left', 'right'])
-    if side == 'top':
-        x = random.randint(0, WIDTH)
-        y = -30
-    elif side == 'bottom':
-        x = random.randint(0, WIDTH)
-        y = HEIGHT
-    elif side == 'left':
-        x = -30
-        y = random.randint(0, HEIGHT)
-    else:
-        x = WIDTH
-        y = random.randint(0, HEIGHT)
-    if enemy_type == "basic":
-        return {'x': x, 'y': y, 'size': 35, 'speed': 2, 'type': 'basic', 'hp': 2, 'score_value': 10}
-    elif enemy_type == "armored":
-        return {'x': x, 'y': y, 'size': 35, 'speed': 1, 'type': 'armored', 'hp': 3, 'score_value': 15}
-    elif enemy_type == "runner":
-        return {'x': x, 'y': y, 'size': 35, 'speed': 7, 'type': 'runner', 'hp': 1, 'score_value': 15}
-    elif enemy_type == "basic+":
-        return {'x': x, 'y': y, 'size': 35, 'speed': 2.5, 'type': 'basic+', 'hp': 3, 'score_value': 20}
-    elif enemy_type == "armored+":
-        return {'x': x, 'y': y, 'size': 35, 'speed': 1.5, 'type': 'armored+', 'hp': 4, 'score_value': 25}
-    elif enemy_type == "runner+":
-        return {'x': x, 'y': y, 'size': 35, 'speed': 7.5, 'type': 'runner+', 'hp': 2, 'score_value': 35}
-    else:
-        print(f"Неизвестный тип врага: {enemy_type}")
-        return {'x': 0, 'y': 0, 'size': 35, 'speed': 1, 'type': 'basic', 'hp': 1, 'score_value': 0}
-
-def check_collision(x1, y1, size1, x2, y2, size2):
-    return (x1 < x2 + size2 and x1 + size1 > x2 and
-            y1 < y2 + size2 and y1 + size1 > y2)
-
 def toggle_fullscreen():
-    global fullscreen, screen, WIDTH, HEIGHT, left_joystick, right_joystick, player_x, player_y, state
+    global fullscreen, screen, WIDTH, HEIGHT, left_joystick, right_joystick, presented_menu
     fullscreen = not fullscreen
     global_stats["fullscreen"] = fullscreen
     
-    if state == "playing":
-        rel_x = player_x / WIDTH
-        rel_y = player_y / HEIGHT
-    
     if fullscreen:
         display_info = pygame.display.Info()
-        WIDTH = display_info.current_w
-        HEIGHT = display_info.current_h
-        screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.FULLSCREEN)
+        window_size = (display_info.current_w, display_info.current_h)
     else:
-        WIDTH = 1280
-        HEIGHT = 720
-        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        window_size = (1280, 720)
+    if target.mode == "native":
+        WIDTH, HEIGHT = window_size
+    flags = target.window_flags() | (pygame.FULLSCREEN if fullscreen else 0)
+    # С pygame.SCALED окно задаётся логическим размером, SDL растянет его сам.
+    window = pygame.display.set_mode((WIDTH, HEIGHT) if target.mode == "gpu" else window_size, flags)
+    screen = target.set_window(window)
     
-    if state == "playing":
-        player_x = int(rel_x * WIDTH)
-        player_y = int(rel_y * HEIGHT)
-        player_x = max(0, min(WIDTH - player_size, player_x))
-        player_y = max(0, min(HEIGHT - player_size, player_y))
+    world.resize(WIDTH, HEIGHT)
+    recorder.resize(WIDTH, HEIGHT)
+    dirty.invalidate((WIDTH, HEIGHT))
+    menu_cache.clear()
+    sprites.invalidate()
+    presented_menu = None
     
     left_joystick = VirtualJoystick(int(WIDTH * 0.1), HEIGHT - 120, 70, 30, 0, "left")
     right_joystick = VirtualJoystick(int(WIDTH * 0.9), HEIGHT - 120, 70, 30, 1, "right")
     left_joystick.update_rect()
     right_joystick.update_rect()
+    controls.set_joysticks(left_joystick, right_joystick)
     
-    save_stats(global_stats)
-
-def ray_hits_enemy(ray_start, ray_end, enemy):
-    ex = enemy['x'] + enemy['size'] / 2
-    ey = enemy['y'] + enemy['size'] / 2
-    x0, y0 = ray_start
-    x1, y1 = ray_end
-    dx = x1 - x0
-    dy = y1 - y0
-    if abs(dx) < 1e-6 and abs(dy) < 1e-6:
-        return False
-    t = ((ex - x0) * dx + (ey - y0) * dy) / (dx*dx + dy*dy)
-    if t < 0 or t > 1:
-        return False
-    closest_x = x0 + t * dx
-    closest_y = y0 + t * dy
-    dist = math.hypot(closest_x - ex, closest_y - ey)
-    return dist <= enemy['size'] / 2
-
-def format_time(seconds):
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    secs = seconds % 60
-    if hours > 0:
-        return f"{hours}:{minutes:02d}:{secs:02d}"
+    saver.save(global_stats)
+
+class MenuButton:
+    def __init__(self, rect, label="", text_color=(20, 20, 30), hoverable=True):
+        self.rect = rect
+        self.label = label
+        self.text_color = text_color
+        self.hoverable = hoverable
+
+def draw_button(surface, button, color):
+    pygame.draw.rect(surface, color, button.rect, border_radius=10)
+    if button.label:
+        txt = text_cache.render(font, button.label, button.text_color)
+        surface.blit(txt, (button.rect.centerx - txt.get_width() // 2, button.rect.centery - txt.get_height() // 2))
+
+def hovered_button(buttons, pos):
+    for name, button in buttons.items():
+        if button.hoverable and button.rect.collidepoint(pos):
+            return name
+    return None
+
+def cached_menu(name, key, build):
+    # Статичная часть экрана меню собирается один раз и пересобирается только
+    # при смене ключа (разрешение, показанные значения из global_stats).
+    entry = menu_cache.get(name)
+    if entry is None or entry[0] != key:
+        entry = (key, build())
+        menu_cache[name] = entry
+    return entry[1]
+
+def present_menu(name, key, background, buttons, hover):
+    # Экран перерисовывается и выводится только когда сменился фон
+    # или подсвеченная кнопка, иначе кадр пропускается целиком.
+    global need_flip, presented_menu
+    frame_key = (name, key, hover)
+    if frame_key == presented_menu:
+        need_flip = False
+        return
+    presented_menu = frame_key
+    screen.blit(background, (0, 0))
+    if hover is not None:
+        draw_button(screen, buttons[hover], BUTTON_HOVER)
+
+def menu_surface(color):
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(color)
+    return surface
+
+def blit_centered(surface, text_surface, y):
+    surface.blit(text_surface, (WIDTH // 2 - text_surface.get_width() // 2, y))
+
+def finish_menu(surface, buttons):
+    for button in buttons.values():
+        if button.hoverable:
+            draw_button(surface, button, BUTTON_COLOR)
+    return surface, buttons
+
+def build_main_menu():
+    surface = menu_surface((15, 15, 30))
+
+    title = big_font.render("CYBER - ARENA", True, (100, 255, 255))
+    title_shadow = big_font.render("CYBER - ARENA", True, (0, 150, 200))
+    if quality.tier == 0:
+        glow_surf = big_font.render("CYBER - ARENA", True, (50, 200, 255))
+        for i in range(4):
+            glow_surf.set_alpha(80 - i * 20)
+            surface.blit(glow_surf, (WIDTH // 2 - title.get_width() // 2 + i, 80 + i))
+            surface.blit(glow_surf, (WIDTH // 2 - title.get_width() // 2 - i, 80 - i))
+    surface.blit(title_shadow, (WIDTH // 2 - title.get_width() // 2 + 3, 83))
+    surface.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
+
+    buttons = {
+        "play": MenuButton(pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 - 120, 240, 50), "ИГРАТЬ"),
+        "shop": MenuButton(pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 - 50, 240, 50), "МАГАЗИН"),
+        "settings": MenuButton(pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 + 20, 240, 50), "НАСТРОЙКИ"),
+        "help": MenuButton(pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 + 90, 240, 50), "СПРАВКА"),
+    }
+
+    total_money_text = font.render(f"ВСЕГО МОНЕТ: {global_stats['total_money']}", True, (200, 200, 255))
+    blit_centered(surface, total_money_text, HEIGHT // 2 + 160)
+    return finish_menu(surface, buttons)
+
+def build_shop():
+    surface = menu_surface((25, 20, 40))
+    title = big_font.render("МАГАЗИН", True, (255, 200, 100))
+    blit_centered(surface, title, 50)
+
+    total_money_text = font.render(f"Ваши монеты: {global_stats['total_money']}", True, TEXT_COLOR)
+    blit_centered(surface, total_money_text, 130)
+
+    y = 180
+    item_rect = pygame.Rect(WIDTH//2 - 250, y, 500, 100)
+    pygame.draw.rect(surface, BUTTON_COLOR, item_rect, border_radius=10)
+    item_title = font.render("Одноразовый щит", True, (20, 20, 30))
+    item_price = font.render("Цена: 1,000 монет", True, (20, 20, 30))
+    surface.blit(item_title, (item_rect.centerx - item_title.get_width()//2, item_rect.y + 15))
+    surface.blit(item_price, (item_rect.centerx - item_price.get_width()//2, item_rect.y + 65))
+
+    y += 120
+    purchased = global_stats['shield_purchased']
+    buy = MenuButton(pygame.Rect(WIDTH//2 - 250, y, 500, 50),
+                     "КУПИТЬ ЩИТ (1,000)" if not purchased else "ЩИТ КУПЛЕН",
+                     (20, 20, 30) if not purchased else (100, 100, 100),
+                     hoverable=not purchased)
+    if purchased:
+        draw_button(surface, buy, (100, 100, 100))
+
+    y += 70
+    if purchased and not global_stats['shield_active']:
+        activate_label = "АКТИВИРОВАТЬ ЩИТ ДЛЯ СЛЕД. ИГРЫ"
+    elif global_stats['shield_active']:
+        activate_label = "ЩИТ АКТИВЕН ДЛЯ СЛЕД. ИГРЫ"
     else:
-        return f"{minutes}:{secs:02d}"
-        
+        activate_label = "СНАЧАЛА КУПИТЕ ЩИТ"
+    activate = MenuButton(pygame.Rect(WIDTH//2 - 250, y, 500, 50), activate_label,
+                          hoverable=purchased and not global_stats['shield_active'])
+    if not purchased:
+        draw_button(surface, activate, (100, 100, 100))
+    elif global_stats['shield_active']:
+        draw_button(surface, activate, (50, 200, 50))
+
+    y += 100
+    back = MenuButton(pygame.Rect(WIDTH//2 - 100, y, 200, 50), "Назад")
+    return finish_menu(surface, {"buy": buy, "activate": activate, "back": back})
+
+def build_settings():
+    surface = menu_surface((20, 20, 40))
+    title = big_font.render("НАСТРОЙКИ", True, (100, 255, 255))
+    blit_centered(surface, title, 50)
+    quality_text = get_font(24).render(f"Качество графики (авто): {quality.label()}", True, TEXT_COLOR)
+    blit_centered(surface, quality_text, 118)
+    y = 150
+
+    blit_centered(surface, font.render("Режим управления:", True, TEXT_COLOR), y)
+    y += 60
+
+    buttons = {
+        "keyboard": MenuButton(pygame.Rect(WIDTH//2 - 260, y, 250, 50), "Клавиатура", hoverable=False),
+        "joystick": MenuButton(pygame.Rect(WIDTH//2 + 10, y, 250, 50), "Джойстики", hoverable=False),
+    }
+    draw_button(surface, buttons["keyboard"], BUTTON_HOVER if control_mode == "keyboard" else BUTTON_COLOR)
+    draw_button(surface, buttons["joystick"], BUTTON_HOVER if control_mode == "joystick" else BUTTON_COLOR)
+    y += 100
+
+    for name, label, volume in (("music", "Музыка", music_volume), ("shoot", "Выстрел", shoot_volume), ("death", "Смерть", death_volume)):
+        blit_centered(surface, font.render(f"{label}: {int(volume * 100)}%", True, TEXT_COLOR), y)
+        dec = MenuButton(pygame.Rect(WIDTH//2 - 150, y, 40, 40), hoverable=False)
+        inc = MenuButton(pygame.Rect(WIDTH//2 + 110, y, 40, 40), hoverable=False)
+        pygame.draw.rect(surface, BUTTON_COLOR, dec.rect, border_radius=10)
+        pygame.draw.rect(surface, BUTTON_COLOR, inc.rect, border_radius=10)
+        surface.blit(text_cache.render(font, "-", (20, 20, 30)), (dec.rect.centerx - 8, dec.rect.centery - 12))
+        surface.blit(text_cache.render(font, "+", (20, 20, 30)), (inc.rect.centerx - 8, inc.rect.centery - 12))
+        buttons["dec_" + name] = dec
+        buttons["inc_" + name] = inc
+        y += 60
+
+    blit_centered(surface, font.render("Полноэкранный режим", True, TEXT_COLOR), y)
+    fs_btn = pygame.Rect(WIDTH//2 - 100, y + 40, 200, 50)
+    pygame.draw.rect(surface, BUTTON_HOVER if fullscreen else BUTTON_COLOR, fs_btn, border_radius=10)
+    surface.blit(text_cache.render(font, "ВКЛ" if fullscreen else "ВЫКЛ", (20, 20, 30)), (fs_btn.centerx - 20, fs_btn.centery - 15))
+    buttons["fullscreen"] = MenuButton(fs_btn, hoverable=False)
+    y += 120
+
+    buttons["back"] = MenuButton(pygame.Rect(WIDTH//2 - 100, y, 200, 50), "Назад")
+    return finish_menu(surface, buttons)
+
+HELP_LINKS = [
+    ("youtube", "https://www.youtube.com/@Adekvat_2008"),
+    ("donate", "https://www.donationalerts.com/r/adekvat_2008"),
+    ("telegram", "https://t.me/+79827582951"),
+]
+
+def build_help():
+    surface = menu_surface((20, 25, 50))
+    title = big_font.render("СПРАВКА", True, (100, 255, 255))
+    blit_centered(surface, title, 50)
+
+    lines = [
+    "Связь с автором:"
+    ]
+
+    y = 120
+    for line in lines:
+        blit_centered(surface, font.render(line, True, TEXT_COLOR), y)
+        y += 35
+
+    buttons = {}
+    for name, label, color in (("youtube", "YouTube: @Adekvat_2008", (255, 100, 100)),
+                               ("donate", "DonationAlerts: @adekvat_2008", (100, 255, 100)),
+                               ("telegram", "Telegram: +7 982 758-29-51", (100, 200, 255))):
+        y += 40
+        link_text = font.render(label, True, color)
+        link_rect = link_text.get_rect(center=(WIDTH//2, y))
+        surface.blit(link_text, link_rect)
+        buttons[name] = MenuButton(link_rect, hoverable=False)
+
+    buttons["back"] = MenuButton(pygame.Rect(WIDTH//2 - 100, HEIGHT - 120, 200, 50), "Назад")
+    return finish_menu(surface, buttons)
+
+def build_game_over():
+    surface = menu_surface((10, 10, 20))
+    over_text = big_font.render("ИГРА ОКОНЧЕНА", True, (255, 100, 100))
+    score_text = get_font(48).render(f"Очков: {final_score}", True, TEXT_COLOR)
+    time_text = get_font(48).render(f"Время: {format_time(final_time)}", True, TEXT_COLOR)
+    total_text = font.render(f"Всего: {global_stats['total_score']} очков, {global_stats['total_deaths']} смертей", True, TEXT_COLOR)
+    best_text = font.render(f"Рекорд: {global_stats['best_session_score']}", True, TEXT_COLOR)
+    y_offset = HEIGHT // 2 - 120
+    for text in (over_text, score_text, time_text, total_text, best_text):
+        blit_centered(surface, text, y_offset)
+        y_offset += text.get_height() + (10 if text is over_text else 5)
+
+    buttons = {
+        "restart": MenuButton(pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 + 90, 200, 50), "Заново"),
+        "menu": MenuButton(pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 + 150, 200, 50), "В меню"),
+    }
+    return finish_menu(surface, buttons)
+
+# Профилировщик кадра: F3 включает замеры фаз и оверлей с ними.
+PROFILER_KEY = pygame.K_F3
+profiler = FrameProfiler()
+profiler_font = None
+profiler_overlay = None
+profiler_overlay_wait = 0
+
+def draw_profiler_overlay():
+    global profiler_font, profiler_overlay, profiler_overlay_wait
+    # Таблица пересобирается раз в полсекунды (30 кадров), а не каждый кадр.
+    profiler_overlay_wait -= 1
+    if profiler_overlay is None or profiler_overlay_wait <= 0:
+        if profiler_font is None:
+            profiler_font = pygame.font.SysFont("monospace", 16)
+        lines = [profiler_font.render(line, True, TEXT_COLOR) for line in profiler.overlay_lines()]
+        line_height = profiler_font.get_linesize()
+        profiler_overlay = pygame.Surface((max(line.get_width() for line in lines) + 20, line_height * len(lines) + 20), pygame.SRCALPHA)
+        profiler_overlay.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            profiler_overlay.blit(line, (10, 10 + i * line_height))
+        profiler_overlay_wait = 30
+    dirty.static("profiler", profiler_overlay, screen.blit(profiler_overlay, (WIDTH - profiler_overlay.get_width() - 20, 50)))
+
+def build_hud():
+    lines = [
+        ("kills", text_cache.render(font, f"Убийства: {world.kills}", TEXT_COLOR), (20, 20)),
+        ("time", text_cache.render(font, f"Время: {format_time(world.elapsed_seconds)}", TEXT_COLOR), (20, 60)),
+        ("money", text_cache.render(font, f"Монеты: {world.money}", TEXT_COLOR), (20, 100)),
+        ("score", text_cache.render(font, f"Очки: {world.session_score}", TEXT_COLOR), (20, 140)),
+        ("level", text_cache.render(font, f"Уровень: {world.upgrade_level}", TEXT_COLOR), (20, 180)),
+        ("damage", text_cache.render(font, f"Урон: {world.player_damage:.1f}", TEXT_COLOR), (20, 220)),
+        ("shield", text_cache.render(font, f"Щит: {'АКТИВЕН' if world.has_shield else 'НЕТ'}", TEXT_COLOR), (20, 260)),
+    ]
+    mode_text = text_cache.render(get_font(24), f"Управление: {'Клавиатура' if control_mode == 'keyboard' else 'Джойстики'}", TEXT_COLOR)
+    lines.insert(0, ("mode", mode_text, (WIDTH - mode_text.get_width() - 20, 20)))
+    return lines
+
+def apply_quality():
+    global hud
+    global_stats["quality_tier"] = quality.tier
+    saver.save(global_stats)
+    target.fast = not quality.enabled("smooth_scaling")
+    hud = None
+    dirty.invalidate()
+
+def inactive_quality_steps():
+    # Пункты качества, которые при текущих настройках ничего не меняют.
+    skip = []
+    if not target.smoothing:
+        skip.append("smooth_scaling")
+    if control_mode != "joystick":
+        skip.append("joystick_alpha")
+    return skip
+
+startup_done = False
+
+def finish_startup():
+    global startup_done, last_frame_time
+    startup.mark("первый кадр")
+    pygame.init()
+    audio.start()
+    startup.mark("микшер")
+    startup_done = True
+    # До pygame.init() таймер pygame не запущен и get_ticks() возвращает 0.
+    last_frame_time = pygame.time.get_ticks()
+    if PROFILE_STARTUP:
+        print("Запуск по этапам:")
+        print("\n".join(startup.report()))
+
 clock = pygame.time.Clock()
 running = True
-mouse_down = False
-last_shot_time = 0
-active_laser = None
-last_sound_time = 0
-last_upgrade_check = 0
+need_flip = True
+menu_cache = {}
+presented_menu = None
+last_frame_time = pygame.time.get_ticks()
+last_archetypes_check = 0
+hud = None
+hud_frame = 0
 
 left_joystick = VirtualJoystick(int(WIDTH * 0.1), HEIGHT - 120, 70, 30, 0, "left")
 right_joystick = VirtualJoystick(int(WIDTH * 0.9), HEIGHT - 120, 70, 30, 1, "right")
 left_joystick.update_rect()
 right_joystick.update_rect()
-
-touch_counter = 0
+controls = InputLayer()
+controls.set_joysticks(left_joystick, right_joystick)
+startup.mark("подготовка")
 
 while running:
+    frame_started = time.perf_counter()
+    profiler.begin_frame()
+    need_flip = True
     current_time = pygame.time.get_ticks()
-    mouse_pos = pygame.mouse.get_pos()
-    mouse_pressed = False
+    frame_dt = current_time - last_frame_time
+    last_frame_time = current_time
+    # Правки archetypes.json подхватываются на лету, проверка раз в секунду.
+    if current_time - last_archetypes_check >= 1000:
+        last_archetypes_check = current_time
+        archetypes = reload_if_changed(world.archetypes)
+        if archetypes is not None:
+            world.set_archetypes(archetypes)
+            sprites.invalidate()
+            dirty.invalidate()
+            print("archetypes.json перезагружен")
+    mouse_pos = target.to_surface(pygame.mouse.get_pos())
     
     keys = pygame.key.get_pressed()
     if keys[pygame.K_ESCAPE] and state == "playing":
         state = "main_menu"
-        left_joystick.reset()
-        right_joystick.reset()
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-            
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:
-                mouse_pressed = True
-                if control_mode == "joystick":
-                    touch_counter += 1
-                    touch_id = f"mouse_{touch_counter}"
-                    
-                    if event.pos[0] < WIDTH // 2:
-                        if not left_joystick.active:
-                            left_joystick.update(event.pos, touch_id)
-                    else:
-                        if not right_joystick.active:
-                            right_joystick.update(event.pos, touch_id)
-                        
-        if event.type == pygame.MOUSEBUTTONUP:
-            if event.button == 1:
-                mouse_down = False
-                active_laser = None
-                if control_mode == "joystick":
-                    if left_joystick.active:
-                        left_joystick.reset()
-                    if right_joystick.active:
-                        right_joystick.reset()
-                            
-        if event.type == pygame.MOUSEMOTION:
-            if control_mode == "joystick" and event.buttons[0]:
-                if event.pos[0] < WIDTH // 2:
-                    if left_joystick.active:
-                        left_joystick.update(event.pos, left_joystick.touch_id)
-                else:
-                    if right_joystick.active:
-                        right_joystick.update(event.pos, right_joystick.touch_id)
-        
-        if event.type == pygame.FINGERDOWN:
-            if control_mode == "joystick":
-                x = event.x * WIDTH
-                y = event.y * HEIGHT
-                touch_id = f"finger_{event.finger_id}"
-                
-                if x < WIDTH // 2:
-                    if not left_joystick.active:
-                        left_joystick.update((x, y), touch_id)
-                else:
-                    if not right_joystick.active:
-                        right_joystick.update((x, y), touch_id)
-                    
-        if event.type == pygame.FINGERUP:
-            if control_mode == "joystick":
-                if left_joystick.active:
-                    left_joystick.reset()
-                if right_joystick.active:
-                    right_joystick.reset()
-                        
-        if event.type == pygame.FINGERMOTION:
-            if control_mode == "joystick":
-                x = event.x * WIDTH
-                y = event.y * HEIGHT
-                
-                if x < WIDTH // 2:
-                    if left_joystick.active:
-                        left_joystick.update((x, y), left_joystick.touch_id)
-                else:
-                    if right_joystick.active:
-                        right_joystick.update((x, y), right_joystick.touch_id)
+        controls.release_all()
+
+    controls.configure(state, control_mode)
+    controls.poll(target)
+    mouse_pressed = controls.clicked
+    if controls.quit:
+        running = False
+    if PROFILER_KEY in controls.key_presses:
+        world.profiler = profiler if profiler.toggle() else None
+        profiler_overlay = None
+        dirty.invalidate()
 
     if state == "playing":
-        if control_mode == "keyboard":
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-                player_x -= player_speed
-            if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-                player_x += player_speed
-            if keys[pygame.K_UP] or keys[pygame.K_w]:
-                player_y -= player_speed
-            if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-                player_y += player_speed
-        else:
-            if left_joystick.active:
-                player_x += left_joystick.normalized_dx * player_speed * 1.5
-                player_y += left_joystick.normalized_dy * player_speed * 1.5
-
-        player_x = max(0, min(WIDTH - player_size, player_x))
-        player_y = max(0, min(HEIGHT - player_size, player_y))
-
-        play_time_seconds = (current_time - start_time) // 1000
-        
-        if current_time - last_upgrade_check >= 1000:
-            if play_time_seconds >= 30 and upgrade_level == 0:
-                upgrade_level = 1
-                player_damage = 1.2
-            elif play_time_seconds >= 60 and upgrade_level == 1:
-                upgrade_level = 2
-                player_damage = 1.4
-            elif play_time_seconds >= 90 and upgrade_level == 2:
-                upgrade_level = 3
-                player_damage = 1.6
-            elif play_time_seconds >= 120 and upgrade_level == 3:
-                upgrade_level = 4
-                player_damage = 1.8
-            elif play_time_seconds >= 150 and upgrade_level == 4:
-                upgrade_level = 5
-                player_damage = 2.0
-            elif play_time_seconds >= 180 and upgrade_level == 5:
-                upgrade_level = 6
-                player_damage = 2.2
-            elif play_time_seconds >= 210 and upgrade_level == 6:
-                upgrade_level = 7
-                player_damage = 2.4
-            elif play_time_seconds >= 240 and upgrade_level == 7:
-                upgrade_level = 8
-                player_damage = 2.6
-            elif play_time_seconds >= 270 and upgrade_level == 8:
-                upgrade_level = 9
-                player_damage = 2.8
-            elif play_time_seconds >= 300 and upgrade_level == 9:
-                upgrade_level = 10
-                player_damage = 3.0
-            
-            global_stats["upgrade_level"] = upgrade_level
-            save_stats(global_stats)
-            last_upgrade_check = current_time
-
-        session_score = kills + play_time_seconds // 2
-
-        shoot_now = False
-        shoot_angle = None
-        
-        if control_mode == "keyboard":
-            if mouse_down:
-                shoot_now = True
-                mx, my = mouse_pos
-                px = player_x + player_size / 2
-                py = player_y + player_size / 2
-                shoot_angle = math.atan2(my - py, mx - px)
-        else:
-            if right_joystick.active and (right_joystick.normalized_dx != 0 or right_joystick.normalized_dy != 0):
-                shoot_now = True
-                shoot_angle = math.atan2(right_joystick.normalized_dy, right_joystick.normalized_dx)
-
-        if shoot_now and shoot_angle is not None:
-            px = player_x + player_size / 2
-            py = player_y + player_size / 2
-            end_x = px + math.cos(shoot_angle) * 2000
-            end_y = py + math.sin(shoot_angle) * 2000
-            
-            active_laser = {
-                'start': (px, py),
-                'end': (end_x, end_y)
-            }
-            
-            if current_time - last_sound_time >= 200:
-                if shoot_sound:
-                    shoot_sound.play()
-                last_sound_time = current_time
-            
-            if current_time - last_shot_time >= 1:
-                enemies_sorted = sorted(
-                    enemies,
-                    key=lambda e: math.hypot(
-                        (e['x'] + e['size']/2) - px,
-                        (e['y'] + e['size']/2) - py
-                    )
-                )
-                
-                hit_any = False
-                for enemy in enemies_sorted:
-                    if ray_hits_enemy((px, py), (end_x, end_y), enemy):
-                        enemy['hp'] -= player_damage * 0.1
-                        hit_any = True
-                        if enemy['hp'] <= 0:
-                            score_to_add = enemy.get('score_value', 10)
-                            money += score_to_add
-                            kills += 1
-                            enemies.remove(enemy)
-                            if death_sound:
-                                death_sound.play()
-                                
-                if hit_any:
-                    last_shot_time = current_time
-
-        spawn_timer += 1
-
-        if upgrade_level == 0:
-            available_types = ["basic"]
-            spawn_interval = 120
-        elif upgrade_level == 1:
-            available_types = ["basic", "armored"]
-            spawn_interval = 110
-        elif upgrade_level == 2:
-            available_types = ["armored", "runner"]
-            spawn_interval = 100
-        elif upgrade_level == 3:
-            available_types = ["basic+", "runner+", "basic", "armored+"]
-            spawn_interval = 90
-        elif upgrade_level == 4:
-            available_types = ["basic+", "runner+", "basic", "armored+"]
-            spawn_interval = 80
-        elif upgrade_level == 5:
-            available_types = ["basic+", "runner+", "basic", "armored+"]
-            spawn_interval = 70
-        elif upgrade_level >= 6:
-            available_types = ["basic+", "runner+", "basic", "armored+"]
-            spawn_interval = 60
-        else:
-            available_types = ["basic"]
-            spawn_interval = 120
-
-        if spawn_timer >= spawn_interval:
-            etype = random.choice(available_types)
-            enemies.append(spawn_enemy(etype))
-            spawn_timer = 0
-
-        px = player_x + player_size / 2
-        py = player_y + player_size / 2
-        for enemy in enemies[:]:
-            ex = enemy['x'] + enemy['size']/2
-            ey = enemy['y'] + enemy['size']/2
-            dx = px - ex
-            dy = py - ey
-            dist = max(math.hypot(dx, dy), 0.1)
-            enemy['x'] += dx / dist * enemy['speed']
-            enemy['y'] += dy / dist * enemy['speed']
-            if check_collision(player_x, player_y, player_size, enemy['x'], enemy['y'], enemy['size']):
-                if has_shield:
-                    has_shield = False
+        if presented_menu is not None:
+            dirty.invalidate()
+        presented_menu = None
+        player_center = (world.player_x + world.player_size / 2, world.player_y + world.player_size / 2)
+        inputs = controls.snapshot(control_mode, player_center, mouse_pos)
+
+        profiler.mark("ввод")
+        frame_seconds = min(frame_dt / 1000, MAX_FRAME_TIME)
+        sim_accumulator += frame_seconds
+        while sim_accumulator >= sim_dt and world.alive:
+            sim_accumulator -= sim_dt
+            recorder.record(inputs)
+            for event_name, *args in world.step(inputs, sim_dt):
+                if event_name == "shoot":
+                    audio.play("shoot")
+                elif event_name == "kill":
+                    audio.play("death", args[0])
+                elif event_name == "upgrade":
+                    global_stats["upgrade_level"] = args[0]
+                    saver.save(global_stats)
+                elif event_name == "shield_lost":
                     global_stats["shield_active"] = False
                     global_stats["shield_purchased"] = False
-                    save_stats(global_stats)
-                    enemies.remove(enemy)
-                else:
-                    global_stats["total_deaths"] += 1
-                    global_stats["total_score"] += session_score
-                    global_stats["total_playtime_seconds"] += (current_time - start_time) // 1000
-                    global_stats["sessions_played"] += 1
-                    global_stats["total_money"] += money
-                    if session_score > global_stats["best_session_score"]:
-                        global_stats["best_session_score"] = session_score
-                    save_stats(global_stats)
+                    saver.save(global_stats)
+                elif event_name == "death":
+                    final_score, final_time = args
+                    global_stats.update(history.record(final_score, final_time, world.kills, world.money,
+                                                       world.upgrade_level, world.peak_enemies))
+                    global_stats["total_money"] += world.money
+                    saver.save(global_stats)
+                    try:
+                        recorder.save(world)
+                    except OSError as e:
+                        print(f"Не удалось сохранить повтор: {e}")
                     state = "game_over"
-                    final_score = session_score
-                    final_time = (current_time - start_time) // 1000
+            profiler.mark("события")
+
+        audio.update(frame_seconds)
+        if profiler.enabled:
+            busy, total = audio.busy_voices()
+            profiler.count("голоса", f"{busy}/{total}, запусков {audio.played}, слито {audio.merged}")
+        profiler.mark("звук")
 
-        screen.fill(BACKGROUND)
-        pygame.draw.rect(screen, FLOOR_COLOR, (0, 0, WIDTH, HEIGHT))
+        alpha = min(sim_accumulator / sim_dt, 1.0)
+
+        dirty.begin(screen, FLOOR_COLOR)
         
+        active_laser = world.active_laser
         if active_laser:
-            pygame.draw.line(screen, RAY_COLOR, active_laser['start'], active_laser['end'], 2)
+            laser_width = 2 if quality.enabled("laser") else 1
+            dirty.moving(pygame.draw.line(screen, RAY_COLOR, active_laser['start'], active_laser['end'], laser_width))
             
-        pygame.draw.rect(screen, PLAYER_COLOR, (player_x, player_y, player_size, player_size))
-        
-        if has_shield:
-            pygame.draw.rect(screen, SHIELD_COLOR, (player_x-5, player_y-5, player_size+10, player_size+10), 3)
+        player_x, player_y = world.player_render_pos(alpha)
+        player_size = world.player_size
+        dirty.moving(pygame.draw.rect(screen, PLAYER_COLOR, (player_x, player_y, player_size, player_size)))
         
-        for enemy in enemies:
-            color = get_enemy_color(enemy)
-            pygame.draw.rect(screen, color, (enemy['x'], enemy['y'], enemy['size'], enemy['size']))
-
-        elapsed_seconds = (current_time - start_time) // 1000
-        kill_text = font.render(f"Убийства: {kills}", True, TEXT_COLOR)
-        time_text = font.render(f"Время: {format_time(elapsed_seconds)}", True, TEXT_COLOR)
-        money_text = font.render(f"Монеты: {money}", True, TEXT_COLOR)
-        score_text = font.render(f"Очки: {session_score}", True, TEXT_COLOR)
-        level_text = font.render(f"Уровень: {upgrade_level}", True, TEXT_COLOR)
-        damage_text = font.render(f"Урон: {player_damage:.1f}", True, TEXT_COLOR)
-        shield_text = font.render(f"Щит: {'АКТИВЕН' if has_shield else 'НЕТ'}", True, TEXT_COLOR)
+        if world.has_shield:
+            dirty.moving(screen.blit(sprites.get("shield", build_shield_sprite), (player_x-5, player_y-5)))
         
-        mode_text = small_font.render(f"Управление: {'Клавиатура' if control_mode == 'keyboard' else 'Джойстики'}", True, TEXT_COLOR)
-        screen.blit(mode_text, (WIDTH - mode_text.get_width() - 20, 20))
-        
-        screen.blit(kill_text, (20, 20))
-        screen.blit(time_text, (20, 60))
-        screen.blit(money_text, (20, 100))
-        screen.blit(score_text, (20, 140))
-        screen.blit(level_text, (20, 180))
-        screen.blit(damage_text, (20, 220))
-        screen.blit(shield_text, (20, 260))
+        enemy_alpha = alpha if quality.enabled("enemy_detail") else None
+        enemy_rects = draw_enemies(screen, sprites, world.enemies, world.archetypes, enemy_alpha, doreturn=dirty.enabled)
+        if enemy_rects:
+            dirty.moving_all(enemy_rects)
+
+        profiler.mark("отрисовка")
+
+        hud_frame += 1
+        if hud is None or quality.enabled("hud") or hud_frame % LOW_HUD_INTERVAL == 0:
+            hud = build_hud()
+        for slot, text, pos in hud:
+            dirty.static(slot, text, screen.blit(text, pos))
         
         if control_mode == "joystick":
-            left_joystick.draw(screen)
-            right_joystick.draw(screen)
-            move_label = small_font.render("ДВИЖЕНИЕ", True, TEXT_COLOR)
-            shoot_label = small_font.render("СТРЕЛЬБА", True, TEXT_COLOR)
-            screen.blit(move_label, (left_joystick.base_x - move_label.get_width()//2, left_joystick.base_y - 90))
-            screen.blit(shoot_label, (right_joystick.base_x - shoot_label.get_width()//2, right_joystick.base_y - 90))
+            dirty.moving(left_joystick.draw(screen))
+            dirty.moving(right_joystick.draw(screen))
+            move_label = text_cache.render(get_font(24), "ДВИЖЕНИЕ", TEXT_COLOR)
+            shoot_label = text_cache.render(get_font(24), "СТРЕЛЬБА", TEXT_COLOR)
+            dirty.static("move_label", move_label, screen.blit(move_label, (left_joystick.base_x - move_label.get_width()//2, left_joystick.base_y - 90)))
+            dirty.static("shoot_label", shoot_label, screen.blit(shoot_label, (right_joystick.base_x - shoot_label.get_width()//2, right_joystick.base_y - 90)))
+
+        if profiler.enabled:
+            draw_profiler_overlay()
+        profiler.mark("hud")
+
+        dirty.present(target)
+        need_flip = False
         
     elif state == "main_menu":
-        screen.fill((15, 15, 30))
-    
-        title = big_font.render("CYBER - ARENA", True, (100, 255, 255))
-        title_shadow = big_font.render("CYBER - ARENA", True, (0, 150, 200))
-    
-        for i in range(4):
-            glow_surf = big_font.render("CYBER - ARENA", True, (50, 200, 255))
-            glow_surf.set_alpha(80 - i * 20)
-            screen.blit(glow_surf, (WIDTH // 2 - title.get_width() // 2 + i, 80 + i))
-            screen.blit(glow_surf, (WIDTH // 2 - title.get_width() // 2 - i, 80 - i))
-    
-        screen.blit(title_shadow, (WIDTH // 2 - title.get_width() // 2 + 3, 83))
-        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
-    
-        play_btn = pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 - 120, 240, 50)
-        shop_btn = pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 - 50, 240, 50)
-        settings_btn = pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 + 20, 240, 50)
-        help_btn = pygame.Rect(WIDTH // 2 - 120, HEIGHT // 2 + 90, 240, 50)
-    
-        for btn, text in [(play_btn, "ИГРАТЬ"), (shop_btn, "МАГАЗИН"), (settings_btn, "НАСТРОЙКИ"), (help_btn, "СПРАВКА")]:
-            hover = btn.collidepoint(mouse_pos)
-            color = BUTTON_HOVER if hover else BUTTON_COLOR
-            pygame.draw.rect(screen, color, btn, border_radius=10)
-            txt = font.render(text, True, (20, 20, 30))
-            screen.blit(txt, (btn.centerx - txt.get_width() // 2, btn.centery - txt.get_height() // 2))
-    
-        total_money_text = font.render(f"ВСЕГО МОНЕТ: {global_stats['total_money']}", True, (200, 200, 255))
-        screen.blit(total_money_text, (WIDTH // 2 - total_money_text.get_width() // 2, HEIGHT // 2 + 160))
-    
+        menu_key = (WIDTH, HEIGHT, global_stats['total_money'], quality.tier == 0)
+        background, buttons = cached_menu("main_menu", menu_key, build_main_menu)
+        present_menu("main_menu", menu_key, background, buttons, hovered_button(buttons, mouse_pos))
+
         if mouse_pressed:
-            if play_btn.collidepoint(mouse_pos):
+            if buttons["play"].rect.collidepoint(mouse_pos):
                 state = "playing"
                 reset_game()
-                left_joystick.reset()
-                right_joystick.reset()
-            elif shop_btn.collidepoint(mouse_pos):
+                controls.release_all()
+            elif buttons["shop"].rect.collidepoint(mouse_pos):
                 state = "shop"
-            elif settings_btn.collidepoint(mouse_pos):
+            elif buttons["settings"].rect.collidepoint(mouse_pos):
                 state = "settings"
-            elif help_btn.collidepoint(mouse_pos):
+            elif buttons["help"].rect.collidepoint(mouse_pos):
                 state = "help"
 
     elif state == "shop":
-        screen.fill((25, 20, 40))
-        title = big_font.render("МАГАЗИН", True, (255, 200, 100))
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 50))
-        
-        total_money_text = font.render(f"Ваши монеты: {global_stats['total_money']}", True, TEXT_COLOR)
-        screen.blit(total_money_text, (WIDTH//2 - total_money_text.get_width()//2, 130))
-        
-        y = 180
-        item_rect = pygame.Rect(WIDTH//2 - 250, y, 500, 100)
-        pygame.draw.rect(screen, BUTTON_COLOR, item_rect, border_radius=10)
-        
-        item_title = font.render("Одноразовый щит", True, (20, 20, 30))
-        item_price = font.render("Цена: 1,000 монет", True, (20, 20, 30))
-        
-        screen.blit(item_title, (item_rect.centerx - item_title.get_width()//2, item_rect.y + 15))
-        screen.blit(item_price, (item_rect.centerx - item_price.get_width()//2, item_rect.y + 65))
-        
-        y += 120
-        
-        buy_btn = pygame.Rect(WIDTH//2 - 250, y, 500, 50)
-        buy_btn_text = "КУПИТЬ ЩИТ (1,000)" if not global_stats['shield_purchased'] else "ЩИТ КУПЛЕН"
-        hover_buy = buy_btn.collidepoint(mouse_pos) and not global_stats['shield_purchased']
-        buy_color = BUTTON_HOVER if hover_buy else BUTTON_COLOR
-        if global_stats['shield_purchased']:
-            buy_color = (100, 100, 100)
-        pygame.draw.rect(screen, buy_color, buy_btn, border_radius=10)
-        buy_text = font.render(buy_btn_text, True, (20, 20, 30) if not global_stats['shield_purchased'] else (100, 100, 100))
-        screen.blit(buy_text, (buy_btn.centerx - buy_text.get_width()//2, buy_btn.centery - buy_text.get_height()//2))
-        
-        y += 70
-        
-        activate_btn = pygame.Rect(WIDTH//2 - 250, y, 500, 50)
-        if global_stats['shield_purchased'] and not global_stats['shield_active']:
-            activate_btn_text = "АКТИВИРОВАТЬ ЩИТ ДЛЯ СЛЕД. ИГРЫ"
-        elif global_stats['shield_active']:
-            activate_btn_text = "ЩИТ АКТИВЕН ДЛЯ СЛЕД. ИГРЫ"
-        else:
-            activate_btn_text = "СНАЧАЛА КУПИТЕ ЩИТ"
-        
-        hover_activate = activate_btn.collidepoint(mouse_pos) and global_stats['shield_purchased'] and not global_stats['shield_active']
-        activate_color = BUTTON_HOVER if hover_activate else BUTTON_COLOR
-        if not global_stats['shield_purchased']:
-            activate_color = (100, 100, 100)
-        elif global_stats['shield_active']:
-            activate_color = (50, 200, 50)
-        pygame.draw.rect(screen, activate_color, activate_btn, border_radius=10)
-        activate_text = font.render(activate_btn_text, True, (20, 20, 30))
-        screen.blit(activate_text, (activate_btn.centerx - activate_text.get_width()//2, activate_btn.centery - activate_text.get_height()//2))
-        
-        y += 100
-        
-        back_btn = pygame.Rect(WIDTH//2 - 100, y, 200, 50)
-        hover_back = back_btn.collidepoint(mouse_pos)
-        back_color = BUTTON_HOVER if hover_back else BUTTON_COLOR
-        pygame.draw.rect(screen, back_color, back_btn, border_radius=10)
-        back_text = font.render("Назад", True, (20, 20, 30))
-        screen.blit(back_text, (back_btn.centerx - back_text.get_width()//2, back_btn.centery - back_text.get_height()//2))
-        
+        menu_key = (WIDTH, HEIGHT, global_stats['total_money'], global_stats['shield_purchased'], global_stats['shield_active'])
+        background, buttons = cached_menu("shop", menu_key, build_shop)
+        present_menu("shop", menu_key, background, buttons, hovered_button(buttons, mouse_pos))
+
         if mouse_pressed:
-            if buy_btn.collidepoint(mouse_pos) and not global_stats['shield_purchased']:
+            if buttons["buy"].rect.collidepoint(mouse_pos) and not global_stats['shield_purchased']:
                 if global_stats['total_money'] >= 1000:
                     global_stats['total_money'] -= 1000
                     global_stats['shield_purchased'] = True
-                    save_stats(global_stats)
-            elif activate_btn.collidepoint(mouse_pos) and global_stats['shield_purchased'] and not global_stats['shield_active']:
+                    saver.save(global_stats)
+            elif buttons["activate"].rect.collidepoint(mouse_pos) and global_stats['shield_purchased'] and not global_stats['shield_active']:
                 global_stats['shield_active'] = True
-                has_shield = True
-                save_stats(global_stats)
-            elif back_btn.collidepoint(mouse_pos):
+                world.has_shield = True
+                saver.save(global_stats)
+            elif buttons["back"].rect.collidepoint(mouse_pos):
                 state = "main_menu"
 
     elif state == "settings":
-        screen.fill((20, 20, 40))
-        title = big_font.render("НАСТРОЙКИ", True, (100, 255, 255))
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 50))
-        y = 150
-
-        control_text = font.render("Режим управления:", True, TEXT_COLOR)
-        screen.blit(control_text, (WIDTH//2 - control_text.get_width()//2, y))
-        y += 60
-        
-        keyboard_btn = pygame.Rect(WIDTH//2 - 260, y, 250, 50)
-        joystick_btn = pygame.Rect(WIDTH//2 + 10, y, 250, 50)
-        
-        kb_color = BUTTON_HOVER if control_mode == "keyboard" else BUTTON_COLOR
-        pygame.draw.rect(screen, kb_color, keyboard_btn, border_radius=10)
-        kb_text = font.render("Клавиатура", True, (20, 20, 30))
-        screen.blit(kb_text, (keyboard_btn.centerx - kb_text.get_width()//2, keyboard_btn.centery - kb_text.get_height()//2))
-        
-        js_color = BUTTON_HOVER if control_mode == "joystick" else BUTTON_COLOR
-        pygame.draw.rect(screen, js_color, joystick_btn, border_radius=10)
-        js_text = font.render("Джойстики", True, (20, 20, 30))
-        screen.blit(js_text, (joystick_btn.centerx - js_text.get_width()//2, joystick_btn.centery - js_text.get_height()//2))
-        
-        y += 100
-
-        music_text = font.render(f"Музыка: {int(music_volume * 100)}%", True, TEXT_COLOR)
-        screen.blit(music_text, (WIDTH//2 - music_text.get_width()//2, y))
-        dec_music = pygame.Rect(WIDTH//2 - 150, y, 40, 40)
-        inc_music = pygame.Rect(WIDTH//2 + 110, y, 40, 40)
-        pygame.draw.rect(screen, BUTTON_COLOR, dec_music, border_radius=10)
-        pygame.draw.rect(screen, BUTTON_COLOR, inc_music, border_radius=10)
-        screen.blit(font.render("-", True, (20,20,30)), (dec_music.centerx - 8, dec_music.centery - 12))
-        screen.blit(font.render("+", True, (20,20,30)), (inc_music.centerx - 8, inc_music.centery - 12))
-        y += 60
-
-        shoot_text = font.render(f"Выстрел: {int(shoot_volume * 100)}%", True, TEXT_COLOR)
-        screen.blit(shoot_text, (WIDTH//2 - shoot_text.get_width()//2, y))
-        dec_shoot = pygame.Rect(WIDTH//2 - 150, y, 40, 40)
-        inc_shoot = pygame.Rect(WIDTH//2 + 110, y, 40, 40)
-        pygame.draw.rect(screen, BUTTON_COLOR, dec_shoot, border_radius=10)
-        pygame.draw.rect(screen, BUTTON_COLOR, inc_shoot, border_radius=10)
-        screen.blit(font.render("-", True, (20,20,30)), (dec_shoot.centerx - 8, dec_shoot.centery - 12))
-        screen.blit(font.render("+", True, (20,20,30)), (inc_shoot.centerx - 8, inc_shoot.centery - 12))
-        y += 60
-
-        death_text = font.render(f"Смерть: {int(death_volume * 100)}%", True, TEXT_COLOR)
-        screen.blit(death_text, (WIDTH//2 - death_text.get_width()//2, y))
-        dec_death = pygame.Rect(WIDTH//2 - 150, y, 40, 40)
-        inc_death = pygame.Rect(WIDTH//2 + 110, y, 40, 40)
-        pygame.draw.rect(screen, BUTTON_COLOR, dec_death, border_radius=10)
-        pygame.draw.rect(screen, BUTTON_COLOR, inc_death, border_radius=10)
-        screen.blit(font.render("-", True, (20,20,30)), (dec_death.centerx - 8, dec_death.centery - 12))
-        screen.blit(font.render("+", True, (20,20,30)), (inc_death.centerx - 8, inc_death.centery - 12))
-        y += 60
-
-        fs_text = font.render("Полноэкранный режим", True, TEXT_COLOR)
-        screen.blit(fs_text, (WIDTH//2 - fs_text.get_width()//2, y))
-        fs_btn = pygame.Rect(WIDTH//2 - 100, y + 40, 200, 50)
-        fs_label = "ВКЛ" if fullscreen else "ВЫКЛ"
-        pygame.draw.rect(screen, BUTTON_HOVER if fullscreen else BUTTON_COLOR, fs_btn, border_radius=10)
-        screen.blit(font.render(fs_label, True, (20,20,30)), (fs_btn.centerx - 20, fs_btn.centery - 15))
-        y += 120
-
-        back_btn = pygame.Rect(WIDTH//2 - 100, y, 200, 50)
-        hover = back_btn.collidepoint(mouse_pos)
-        pygame.draw.rect(screen, BUTTON_HOVER if hover else BUTTON_COLOR, back_btn, border_radius=10)
-        back_text = font.render("Назад", True, (20,20,30))
-        screen.blit(back_text, (back_btn.centerx - back_text.get_width()//2, back_btn.centery - back_text.get_height()//2))
+        menu_key = (WIDTH, HEIGHT, control_mode, music_volume, shoot_volume, death_volume, fullscreen, quality.tier)
+        background, buttons = cached_menu("settings", menu_key, build_settings)
+        present_menu("settings", menu_key, background, buttons, hovered_button(buttons, mouse_pos))
 
         if mouse_pressed:
-            if keyboard_btn.collidepoint(mouse_pos) and control_mode != "keyboard":
+            if buttons["keyboard"].rect.collidepoint(mouse_pos) and control_mode != "keyboard":
                 control_mode = "keyboard"
                 global_stats["control_mode"] = control_mode
-                save_stats(global_stats)
-            elif joystick_btn.collidepoint(mouse_pos) and control_mode != "joystick":
+                saver.save(global_stats)
+            elif buttons["joystick"].rect.collidepoint(mouse_pos) and control_mode != "joystick":
                 control_mode = "joystick"
                 global_stats["control_mode"] = control_mode
-                save_stats(global_stats)
-                left_joystick.reset()
-                right_joystick.reset()
+                saver.save(global_stats)
+                controls.release_all()
             
-            if inc_music.collidepoint(mouse_pos) and music_volume < 1.0:
+            if buttons["inc_music"].rect.collidepoint(mouse_pos) and music_volume < 1.0:
                 music_volume = round(music_volume + 0.1, 1)
-                pygame.mixer.music.set_volume(music_volume)
+                audio.set_volume("music", music_volume)
                 global_stats["music_volume"] = music_volume
-                save_stats(global_stats)
-            elif dec_music.collidepoint(mouse_pos) and music_volume > 0.0:
+                saver.save(global_stats)
+            elif buttons["dec_music"].rect.collidepoint(mouse_pos) and music_volume > 0.0:
                 music_volume = round(music_volume - 0.1, 1)
-                pygame.mixer.music.set_volume(music_volume)
+                audio.set_volume("music", music_volume)
                 global_stats["music_volume"] = music_volume
-                save_stats(global_stats)
-            if inc_shoot.collidepoint(mouse_pos) and shoot_volume < 1.0:
+                saver.save(global_stats)
+            if buttons["inc_shoot"].rect.collidepoint(mouse_pos) and shoot_volume < 1.0:
                 shoot_volume = round(shoot_volume + 0.1, 1)
-                if shoot_sound:
-                    shoot_sound.set_volume(shoot_volume)
+                audio.set_volume("shoot", shoot_volume)
                 global_stats["shoot_volume"] = shoot_volume
-                save_stats(global_stats)
-            elif dec_shoot.collidepoint(mouse_pos) and shoot_volume > 0.0:
+                saver.save(global_stats)
+            elif buttons["dec_shoot"].rect.collidepoint(mouse_pos) and shoot_volume > 0.0:
                 shoot_volume = round(shoot_volume - 0.1, 1)
-                if shoot_sound:
-                    shoot_sound.set_volume(shoot_volume)
+                audio.set_volume("shoot", shoot_volume)
                 global_stats["shoot_volume"] = shoot_volume
-                save_stats(global_stats)
-            if inc_death.collidepoint(mouse_pos) and death_volume < 1.0:
+                saver.save(global_stats)
+            if buttons["inc_death"].rect.collidepoint(mouse_pos) and death_volume < 1.0:
                 death_volume = round(death_volume + 0.1, 1)
-                if death_sound:
-                    death_sound.set_volume(death_volume)
+                audio.set_volume("death", death_volume)
                 global_stats["death_volume"] = death_volume
-                save_stats(global_stats)
-            elif dec_death.collidepoint(mouse_pos) and death_volume > 0.0:
+                saver.save(global_stats)
+            elif buttons["dec_death"].rect.collidepoint(mouse_pos) and death_volume > 0.0:
                 death_volume = round(death_volume - 0.1, 1)
-                if death_sound:
-                    death_sound.set_volume(death_volume)
+                audio.set_volume("death", death_volume)
                 global_stats["death_volume"] = death_volume
-                save_stats(global_stats)
-            if fs_btn.collidepoint(mouse_pos):
+                saver.save(global_stats)
+            if buttons["fullscreen"].rect.collidepoint(mouse_pos):
                 toggle_fullscreen()
-            if back_btn.collidepoint(mouse_pos):
+            if buttons["back"].rect.collidepoint(mouse_pos):
                 state = "main_menu"
 
     elif state == "help":
-        screen.fill((20, 25, 50))
-        title = big_font.render("СПРАВКА", True, (100, 255, 255))
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 50))
-    
-        lines = [
-        "Связь с автором:"
-        ]
-    
-        y = 120
-        for line in lines:
-            txt = font.render(line, True, TEXT_COLOR)
-            screen.blit(txt, (WIDTH//2 - txt.get_width()//2, y))
-            y += 35
-    
-        y += 40
-        youtube_text = font.render("YouTube: @Adekvat_2008", True, (255, 100, 100))
-        youtube_rect = youtube_text.get_rect(center=(WIDTH//2, y))
-        screen.blit(youtube_text, youtube_rect)
-    
-        y += 40
-        donate_text = font.render("DonationAlerts: @adekvat_2008", True, (100, 255, 100))
-        donate_rect = donate_text.get_rect(center=(WIDTH//2, y))
-        screen.blit(donate_text, donate_rect)
-    
-        y += 40
-        telegram_text = font.render("Telegram: +7 982 758-29-51", True, (100, 200, 255))
-        telegram_rect = telegram_text.get_rect(center=(WIDTH//2, y))
-        screen.blit(telegram_text, telegram_rect)
-    
-        back_btn = pygame.Rect(WIDTH//2 - 100, HEIGHT - 120, 200, 50)
-        hover = back_btn.collidepoint(mouse_pos)
-        pygame.draw.rect(screen, BUTTON_HOVER if hover else BUTTON_COLOR, back_btn, border_radius=10)
-        back_text = font.render("Назад", True, (20,20,30))
-        screen.blit(back_text, (back_btn.centerx - back_text.get_width()//2, back_btn.centery - back_text.get_height()//2))
+        menu_key = (WIDTH, HEIGHT)
+        background, buttons = cached_menu("help", menu_key, build_help)
+        present_menu("help", menu_key, background, buttons, hovered_button(buttons, mouse_pos))
     
         if mouse_pressed:
-            if back_btn.collidepoint(mouse_pos):
+            if buttons["back"].rect.collidepoint(mouse_pos):
                 state = "main_menu"
         
-            if youtube_rect.collidepoint(mouse_pos):
-                import webbrowser
-                webbrowser.open("https://www.youtube.com/@Adekvat_2008")
-        
-            if donate_rect.collidepoint(mouse_pos):
-                import webbrowser
-                webbrowser.open("https://www.donationalerts.com/r/adekvat_2008")
-        
-            if telegram_rect.collidepoint(mouse_pos):
-                import webbrowser
-                webbrowser.open("https://t.me/+79827582951")
+            for name, url in HELP_LINKS:
+                if buttons[name].rect.collidepoint(mouse_pos):
+                    import webbrowser
+                    webbrowser.open(url)
         
     elif state == "game_over":
-        screen.fill((10, 10, 20))
-        over_text = big_font.render("ИГРА ОКОНЧЕНА", True, (255, 100, 100))
-        score_text = game_over_font.render(f"Очков: {final_score}", True, TEXT_COLOR)
-        time_text = game_over_font.render(f"Время: {format_time(final_time)}", True, TEXT_COLOR)
-        total_text = font.render(f"Всего: {global_stats['total_score']} очков, {global_stats['total_deaths']} смертей", True, TEXT_COLOR)
-        best_text = font.render(f"Рекорд: {global_stats['best_session_score']}", True, TEXT_COLOR)
-        y_offset = HEIGHT // 2 - 120
-        screen.blit(over_text, (WIDTH//2 - over_text.get_width()//2, y_offset))
-        y_offset += over_text.get_height() + 10
-        screen.blit(score_text, (WIDTH//2 - score_text.get_width()//2, y_offset))
-        y_offset += score_text.get_height() + 5
-        screen.blit(time_text, (WIDTH//2 - time_text.get_width()//2, y_offset))
-        y_offset += time_text.get_height() + 5
-        screen.blit(total_text, (WIDTH//2 - total_text.get_width()//2, y_offset))
-        y_offset += total_text.get_height() + 5
-        screen.blit(best_text, (WIDTH//2 - best_text.get_width()//2, y_offset))
-
-        restart_btn = pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 + 90, 200, 50)
-        menu_btn = pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 + 150, 200, 50)
-        for btn, text in [(restart_btn, "Заново"), (menu_btn, "В меню")]:
-            hover = btn.collidepoint(mouse_pos)
-            color = BUTTON_HOVER if hover else BUTTON_COLOR
-            pygame.draw.rect(screen, color, btn, border_radius=10)
-            txt = font.render(text, True, (20, 20, 30))
-            screen.blit(txt, (btn.centerx - txt.get_width()//2, btn.centery - txt.get_height()//2))
+        menu_key = (WIDTH, HEIGHT, final_score, final_time, global_stats['total_score'],
+                     global_stats['total_deaths'], global_stats['best_session_score'])
+        background, buttons = cached_menu("game_over", menu_key, build_game_over)
+        present_menu("game_over", menu_key, background, buttons, hovered_button(buttons, mouse_pos))
+
         if mouse_pressed:
-            if restart_btn.collidepoint(mouse_pos):
+            if buttons["restart"].rect.collidepoint(mouse_pos):
                 state = "playing"
                 reset_game()
-                left_joystick.reset()
-                right_joystick.reset()
-            elif menu_btn.collidepoint(mouse_pos):
+                controls.release_all()
+            elif buttons["menu"].rect.collidepoint(mouse_pos):
                 state = "main_menu"
-                left_joystick.reset()
-                right_joystick.reset()
-
-    pygame.display.flip()
-    clock.tick(60)
-
+                controls.release_all()
+
+    if need_flip:
+        target.flip()
+    profiler.mark("вывод")
+    if not startup_done:
+        finish_startup()
+    elif PROFILE_STARTUP and audio.load_seconds is not None:
+        print(f"Звук загружен в фоне за {audio.load_seconds * 1000:.1f} мс, "
+              f"через {startup.elapsed() * 1000:.1f} мс после старта")
+        PROFILE_STARTUP = False
+    # Губернатор судит только по кадрам игры: меню почти ничего не рисуют.
+    if state == "playing":
+        quality.skip = inactive_quality_steps()
+        if quality.sample(time.perf_counter() - frame_started):
+            apply_quality()
+    else:
+        quality.reset()
+    clock.tick(display_fps)
+    profiler.mark("ожидание")
+    profiler.count("враги", len(world.enemies))
+    profiler.count("качество", quality.tier)
+    profiler.end_frame()
+
+saver.close()
+history.close()
 pygame.quit()
 sys.exit()